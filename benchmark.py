@@ -0,0 +1,325 @@
+import argparse
+import cProfile
+import importlib.util
+import json
+import math
+import os
+import platform
+import pstats
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+TASKS = ('task1', 'task2', 'task3')
+
+# Замеры короче этого времени повторяются несколько раз подряд, чтобы не мерить точность таймера
+MIN_SAMPLE_TIME = 0.001
+
+MIN_SAMPLES = 5
+
+MAX_SAMPLES = 1_000
+
+
+# Замеры всех задач: имя -> контекстный менеджер, который готовит данные и отдаёт замеряемый вызов.
+# Каждая задача объявляет их в словаре BENCHMARKS своего benchmark.py. Модули задач называются
+# одинаково (solution), поэтому каждый benchmark.py загружается со своей папкой в sys.path
+def load_benchmarks(tasks: tuple[str, ...] = TASKS) -> dict:
+
+    benchmarks = {}
+
+    for task in tasks:
+
+        directory = os.path.join(ROOT, task)
+        sys.path.insert(0, directory)
+        sys.modules.pop('solution', None)
+
+        try:
+            spec = importlib.util.spec_from_file_location(f'{task}_benchmark', os.path.join(directory, 'benchmark.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except ImportError as error:
+            print(f'{task}: замеры пропущены, не установлена зависимость ({error})', file=sys.stderr)
+            continue
+        finally:
+            sys.path.remove(directory)
+            sys.modules.pop('solution', None)
+
+        benchmarks.update({f'{task}.{name}': case for name, case in module.BENCHMARKS.items()})
+
+    return benchmarks
+
+
+def select(benchmarks: dict, patterns: list[str] | None) -> dict:
+
+    if not patterns:
+        return benchmarks
+
+    return {name: case for name, case in benchmarks.items() if any(pattern in name for pattern in patterns)}
+
+
+# Сколько вызовов подряд нужно, чтобы один замер длился не меньше MIN_SAMPLE_TIME
+def calibrate(call) -> int:
+
+    number = 1
+
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_SAMPLE_TIME:
+            return number
+        number = number * 2 if elapsed * 10 < MIN_SAMPLE_TIME else int(number * MIN_SAMPLE_TIME / elapsed) + 1
+
+
+# Время одного вызова в каждом замере: замеры повторяются, пока не истечёт budget секунд,
+# но не меньше MIN_SAMPLES и не больше MAX_SAMPLES раз. Замер - среднее по пачке из number
+# вызовов, поэтому задержка отдельного вызова в нём сглаживается
+def collect_samples(call, number: int, budget: float) -> list[float]:
+
+    samples = []
+    deadline = time.perf_counter() + budget
+
+    while len(samples) < MIN_SAMPLES or (len(samples) < MAX_SAMPLES and time.perf_counter() < deadline):
+        started = time.perf_counter()
+        for _ in range(number):
+            call()
+        samples.append((time.perf_counter() - started) / number)
+
+    return samples
+
+
+# Процентиль методом ближайшего ранга: наименьшее значение, которого не превышают хотя бы q% значений
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+# Наибольший объём памяти в байтах, выделенный за один вызов (по данным tracemalloc)
+def measure_peak_memory(call) -> int:
+
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Один замер: среднее, медиана и 99-й процентиль времени вызова в секундах, вызовов в секунду
+# и пиковая память одного вызова в байтах. Медиана и процентиль считаются по средним пачек
+# вызовов (см. collect_samples), а не по отдельным вызовам: p99 показывает медленные пачки.
+# Первый вызов прогревочный и в замер не входит
+def run_case(case, budget: float) -> dict:
+
+    with case() as call:
+
+        call()
+        number = calibrate(call)
+        samples = collect_samples(call, number, budget)
+        peak_memory = measure_peak_memory(call)
+
+    ordered = sorted(samples)
+    mean = statistics.fmean(samples)
+
+    return {
+        'mean': mean,
+        'p50': percentile(ordered, 50),
+        'p99': percentile(ordered, 99),
+        'ops_per_sec': 1 / mean,
+        'peak_memory': peak_memory,
+        'samples': len(samples),
+        'number': number,
+    }
+
+
+def format_time(seconds: float) -> str:
+
+    for unit, scale in (('нс', 1e9), ('мкс', 1e6), ('мс', 1e3)):
+        if seconds * scale < 1000:
+            return f'{seconds * scale:.1f} {unit}'
+
+    return f'{seconds:.2f} с'
+
+
+def format_memory(size: int) -> str:
+
+    for unit in ('Б', 'КБ', 'МБ'):
+        if size < 1024:
+            return f'{size:.0f} {unit}'
+        size /= 1024
+
+    return f'{size:.1f} ГБ'
+
+
+def print_header() -> None:
+    print(f'p50 и p99 - по средним пачек вызовов не короче {format_time(MIN_SAMPLE_TIME)}, а не по отдельным вызовам')
+    print(f'{"замер":<48}{"среднее":>12}{"p50":>12}{"p99":>12}{"вызовов/с":>14}{"память":>10}')
+
+
+def print_result(name: str, result: dict, baseline: dict | None = None) -> None:
+
+    line = (f'{name:<48}{format_time(result["mean"]):>12}{format_time(result["p50"]):>12}'
+            f'{format_time(result["p99"]):>12}{result["ops_per_sec"]:>14.1f}{format_memory(result["peak_memory"]):>10}')
+
+    if baseline is not None:
+        line += f'{result["p50"] / baseline["p50"]:>9.2f}x'
+
+    print(line)
+
+
+# Замеры, медиана которых выросла больше чем на threshold относительно базовой линии.
+# Сравнивается медиана, а не среднее: она меньше зависит от случайных задержек машины
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    return [
+        name for name, result in results.items()
+        if name in baseline and result['p50'] > baseline[name]['p50'] * (1 + threshold)
+    ]
+
+
+def save_baseline(path: str, results: dict) -> None:
+
+    data = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+# Профиль cProfile одного замера: вызов повторяется budget секунд, профиль сохраняется в output_path
+# (для snakeviz, gprof2dot или pstats), самые затратные функции печатаются
+def profile_case(name: str, case, budget: float, output_path: str, limit: int = 25) -> None:
+
+    profiler = cProfile.Profile()
+
+    with case() as call:
+        call()
+        deadline = time.perf_counter() + budget
+        profiler.enable()
+        while time.perf_counter() < deadline:
+            call()
+        profiler.disable()
+
+    profiler.dump_stats(output_path)
+    print(f'Профиль {name} сохранён в {output_path}')
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(limit)
+
+
+# Места, где один вызов замера выделяет больше всего памяти (tracemalloc). Освобождённая память в снимок
+# после вызова не попадает, поэтому во время вызова снимки делаются из отдельного потока каждые interval
+# секунд и показывается самый большой из них (для очень коротких вызовов - снимок после вызова)
+def trace_case(name: str, case, limit: int = 15, interval: float = 0.001) -> None:
+
+    largest = [0, None]
+    done = threading.Event()
+
+    def take_snapshots():
+        while not done.wait(interval):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > largest[0]:
+                largest[:] = current, tracemalloc.take_snapshot()
+
+    with case() as call:
+        call()
+        tracemalloc.start(25)
+        try:
+            sampler = threading.Thread(target=take_snapshots)
+            sampler.start()
+            try:
+                result = call()
+            finally:
+                done.set()
+                sampler.join()
+            current, peak = tracemalloc.get_traced_memory()
+            if current >= largest[0]:
+                largest[:] = current, tracemalloc.take_snapshot()
+            del result
+        finally:
+            tracemalloc.stop()
+
+    snapshot = largest[1].filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, threading.__file__),
+    ])
+
+    print(f'Выделения памяти в {name}: пик {format_memory(peak)}, в снимке {format_memory(largest[0])}')
+    for statistic in snapshot.statistics('lineno')[:limit]:
+        print(f'{format_memory(statistic.size):>10}{statistic.count:>10} блоков  {statistic.traceback[0]}')
+
+
+def parse_arguments(argv: list[str] | None = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description='Замеры производительности решений всех задач')
+    parser.add_argument('patterns', nargs='*', help='запускать только замеры, в имени которых есть одна из строк')
+    parser.add_argument('--list', action='store_true', help='показать имена замеров и выйти')
+    parser.add_argument('--time', type=float, default=1.0, help='секунд на один замер (по умолчанию 1)')
+    parser.add_argument('--save', metavar='PATH', help='сохранить результаты как базовую линию в JSON')
+    parser.add_argument('--compare', metavar='PATH', help='сравнить с базовой линией из JSON')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='допустимый рост медианы при сравнении (по умолчанию 0.1, то есть 10%%)')
+    parser.add_argument('--profile', metavar='NAME', help='профиль cProfile одного замера')
+    parser.add_argument('--profile-output', metavar='PATH', help='файл профиля (по умолчанию NAME.prof)')
+    parser.add_argument('--tracemalloc', metavar='NAME', help='выделения памяти одного замера')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+
+    arguments = parse_arguments(argv)
+    benchmarks = load_benchmarks()
+
+    if arguments.list:
+        print('\n'.join(benchmarks))
+        return 0
+
+    for name in (arguments.profile, arguments.tracemalloc):
+        if name is not None and name not in benchmarks:
+            print(f'Неизвестный замер: {name}', file=sys.stderr)
+            return 2
+
+    if arguments.profile is not None:
+        profile_case(arguments.profile, benchmarks[arguments.profile], arguments.time,
+                     arguments.profile_output or f'{arguments.profile}.prof')
+        return 0
+
+    if arguments.tracemalloc is not None:
+        trace_case(arguments.tracemalloc, benchmarks[arguments.tracemalloc])
+        return 0
+
+    baseline = load_baseline(arguments.compare) if arguments.compare else {}
+    results = {}
+
+    print_header()
+    for name, case in select(benchmarks, arguments.patterns).items():
+        results[name] = run_case(case, arguments.time)
+        print_result(name, results[name], baseline.get(name) if arguments.compare else None)
+
+    if arguments.save:
+        save_baseline(arguments.save, results)
+        print(f'Базовая линия сохранена в {arguments.save}')
+
+    if arguments.compare:
+        regressions = find_regressions(results, baseline, arguments.threshold)
+        if regressions:
+            print(f'Медиана выросла больше чем на {arguments.threshold:.0%}: {", ".join(regressions)}')
+            return 1
+        print(f'Регрессий нет (допуск {arguments.threshold:.0%})')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
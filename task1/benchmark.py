@@ -0,0 +1,228 @@
+from contextlib import contextmanager
+from functools import partial, wraps
+import inspect
+import timeit
+from typing import Iterator, get_type_hints
+
+from solution import compile_annotation, reset_strict_stats, set_strict_mode, strict, strict_stats
+
+
+# Исходная реализация декоратора, с которой сравнивается текущая
+def legacy_strict(func):
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+
+        annotations = func.__annotations__.copy()
+
+        if 'return' in annotations:
+            del annotations['return']
+
+        if annotations:
+
+            signature = inspect.signature(func)
+            arguments = signature.bind(*args, **kwargs)
+            arguments = {argument: type(value) for argument, value in arguments.arguments.items()}
+
+            for annotation, annotation_type in annotations.items():
+                if arguments.get(annotation) != annotation_type:
+                    raise TypeError('Несоответствие типов переданных аргументов объявленным в прототипе функции')
+
+        return func(*args, **kwargs)
+    return wrapper
+
+
+# Прямая проверка без кэша и без декоратора strict: проверки аргументов компилируются один раз,
+# позиционный вызов проверяет каждый аргумент по порядку, остальные вызовы идут через bind().
+# С ней сравнивается strict, чтобы замедление из-за кэша было видно и при любом cache_size
+def direct_strict(func):
+
+    signature = inspect.signature(func)
+    annotations = get_type_hints(func)
+    annotations.pop('return', None)
+    checks = {name: compile_annotation(annotation, 1)[0] for name, annotation in annotations.items()}
+    positional_checks = tuple(checks.get(name) for name in signature.parameters)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+
+        if not kwargs and len(args) == len(positional_checks):
+            for value, check in zip(args, positional_checks):
+                if check is not None and not check(value):
+                    raise TypeError('Несоответствие типов переданных аргументов объявленным в прототипе функции')
+        else:
+            for name, value in signature.bind(*args, **kwargs).arguments.items():
+                if name in checks and not checks[name](value):
+                    raise TypeError('Несоответствие типов переданных аргументов объявленным в прототипе функции')
+
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def sum_two(a: int, b: int) -> int:
+    return a + b
+
+
+def describe_item(name: str, price: float, available: bool) -> str:
+    return f"{name} costs {price:.2f}, available: {available}"
+
+
+# Время одного вызова в наносекундах (лучшее из нескольких повторов)
+def measure(call, number: int) -> float:
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e9
+
+
+def run_benchmark(number: int = 100_000):
+
+    cases = [
+        ('sum_two(1, 2)', sum_two, (1, 2), {}),
+        ('sum_two(a=1, b=2)', sum_two, (), {'a': 1, 'b': 2}),
+        ("describe_item('яблоко', 1.5, True)", describe_item, ('яблоко', 1.5, True), {}),
+    ]
+
+    print(f'{"вызов":<40}{"без декоратора":>16}{"legacy_strict":>16}{"strict":>16}{"ускорение":>12}')
+
+    for title, func, args, kwargs in cases:
+
+        bare = measure(lambda: func(*args, **kwargs), number)
+        legacy_wrapped = legacy_strict(func)
+        legacy = measure(lambda: legacy_wrapped(*args, **kwargs), number)
+        strict_wrapped = strict(func)
+        current = measure(lambda: strict_wrapped(*args, **kwargs), number)
+
+        print(f'{title:<40}{bare:>13.0f} нс{legacy:>13.0f} нс{current:>13.0f} нс{legacy / current:>11.1f}x')
+
+
+# Стоимость вызова sum_two(1, 2) в каждом режиме проверок и доля пропущенных проверок
+def run_modes_benchmark(number: int = 100_000):
+
+    modes = [('always', 1), ('sample', 100), ('first', 10), ('off', 1)]
+
+    print(f'{"режим":<20}{"время вызова":>16}{"проверено":>12}{"пропущено":>12}')
+
+    for mode, n in modes:
+
+        set_strict_mode(mode, n)
+        reset_strict_stats()
+        wrapped = strict(sum_two)
+        current = measure(lambda: wrapped(1, 2), number)
+
+        print(f'{f"{mode} (n={n})":<20}{current:>13.0f} нс{strict_stats["checked"]:>12}{strict_stats["skipped"]:>12}')
+
+    set_strict_mode('always')
+    reset_strict_stats()
+
+
+def scale(value: int | float, factor: int | None) -> float:
+    return value * (factor or 1)
+
+
+# Стоимость вызова с кэшем результатов проверки и без него в сравнении с прямой проверкой
+# direct_strict. Для аннотаций-классов (sum_two, describe_item) кэш не используется и при размере
+# по умолчанию, поэтому попаданий и промахов у них нет
+def run_cache_benchmark(number: int = 100_000):
+
+    cases = [
+        ('sum_two(1, 2)', sum_two, (1, 2)),
+        ("describe_item('яблоко', 1.5, True)", describe_item, ('яблоко', 1.5, True)),
+        ('scale(1.5, 2)', scale, (1.5, 2)),
+    ]
+
+    print(f'{"вызов":<40}{"прямая":>16}{"cache_size=0":>16}{"с кэшем":>16}{"попадания":>12}{"промахи":>12}')
+
+    for title, func, args in cases:
+
+        direct_wrapped = direct_strict(func)
+        direct = measure(lambda: direct_wrapped(*args), number)
+        uncached_wrapped = strict(func, cache_size=0)
+        uncached = measure(lambda: uncached_wrapped(*args), number)
+        cached_wrapped = strict(func)
+        cached = measure(lambda: cached_wrapped(*args), number)
+        info = cached_wrapped.cache_info()
+
+        print(f'{title:<40}{direct:>13.0f} нс{uncached:>13.0f} нс{cached:>13.0f} нс{info.hits:>12}{info.misses:>12}')
+
+
+def total(values: list[int], scale: int | None) -> int:
+    return len(values)
+
+
+# Стоимость проверки list[int] из миллиона элементов при разной глубине проверки
+def run_depth_benchmark(number: int = 1_000):
+
+    values = list(range(1_000_000))
+
+    print(f'{"глубина":<20}{"время вызова":>16}')
+
+    for depth in (1, 100, None):
+        wrapped = strict(total, depth=depth)
+        current = measure(lambda: wrapped(values, None), number if depth else 3)
+        print(f'{str(depth):<20}{current:>13.0f} нс')
+
+
+def numbers(count: int) -> Iterator[int]:
+    yield from range(count)
+
+
+# Цена проверки возвращаемого значения и элементов генератора
+def run_return_benchmark(number: int = 100_000):
+
+    print(f'{"вызов":<40}{"без декоратора":>16}{"strict":>16}{"check_return":>16}')
+
+    cases = [
+        ('sum_two(1, 2)', lambda wrapped: wrapped(1, 2), sum_two, number),
+        ('sum(numbers(1000))', lambda wrapped: sum(wrapped(1000)), numbers, number // 100),
+    ]
+
+    for title, call, func, count in cases:
+        bare = measure(lambda: call(func), count)
+        arguments_only = strict(func)
+        checked = measure(lambda: call(arguments_only), count)
+        with_return = strict(func, check_return=True)
+        returned = measure(lambda: call(with_return), count)
+        print(f'{title:<40}{bare:>13.0f} нс{checked:>13.0f} нс{returned:>13.0f} нс')
+
+
+# Вызов func(*args), обёрнутой декоратором decorator (None - без декоратора), для общего запуска замеров
+@contextmanager
+def call_case(decorator, func, *args, **kwargs):
+    wrapped = decorator(func) if decorator is not None else func
+    yield lambda: wrapped(*args, **kwargs)
+
+
+# Сумма элементов генератора numbers(1000), обёрнутого декоратором decorator
+@contextmanager
+def generator_case(decorator):
+    wrapped = decorator(numbers) if decorator is not None else numbers
+    yield lambda: sum(wrapped(1000))
+
+
+# Замеры для общего запуска из корня репозитория (../benchmark.py): имя -> контекстный менеджер,
+# который готовит данные и отдаёт замеряемый вызов без аргументов. Пары strict.* и strict.direct_*
+# показывают цену кэша и быстрых путей strict относительно прямой проверки direct_strict
+BENCHMARKS = {
+    'strict.bare_sum_two': partial(call_case, None, sum_two, 1, 2),
+    'strict.legacy_sum_two': partial(call_case, legacy_strict, sum_two, 1, 2),
+    'strict.sum_two': partial(call_case, strict, sum_two, 1, 2),
+    'strict.sum_two_kwargs': partial(call_case, strict, sum_two, a=1, b=2),
+    'strict.direct_sum_two': partial(call_case, direct_strict, sum_two, 1, 2),
+    'strict.scale': partial(call_case, strict, scale, 1.5, 2),
+    'strict.scale_no_cache': partial(call_case, partial(strict, cache_size=0), scale, 1.5, 2),
+    'strict.direct_scale': partial(call_case, direct_strict, scale, 1.5, 2),
+    'strict.describe_item': partial(call_case, strict, describe_item, 'яблоко', 1.5, True),
+    'strict.list_depth_100': partial(call_case, partial(strict, depth=100), total, list(range(10_000)), None),
+    'strict.bare_generator': partial(generator_case, None),
+    'strict.check_return_generator': partial(generator_case, partial(strict, check_return=True)),
+}
+
+
+if __name__ == '__main__':
+    run_benchmark()
+    print()
+    run_modes_benchmark()
+    print()
+    run_cache_benchmark()
+    print()
+    run_depth_benchmark()
+    print()
+    run_return_benchmark()
@@ -1,32 +1,634 @@
-from functools import wraps
+import collections.abc
+from collections import OrderedDict, namedtuple
+from functools import partial, wraps
+import asyncio
 import inspect
+from itertools import islice
+import sys
+from types import UnionType
+import typing
+from typing import Annotated, Any, AsyncIterator, Callable, Generator, Iterable, Iterator, Optional, Union, get_args, get_origin, get_type_hints
 import unittest
 
-def strict(func):
+TYPE_ERROR_MESSAGE = 'Несоответствие типов переданных аргументов объявленным в прототипе функции'
 
-    @wraps(func)
-    def wrapper(*args, **kwargs):
+RETURN_ERROR_MESSAGE = 'Несоответствие типа возвращаемого значения объявленному в прототипе функции'
 
-        # Сохраняем аннотации функции
-        annotations = func.__annotations__.copy()
+POSITIONAL_KINDS = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
 
-        # Удаляем аннотацию для 'return', если она есть
-        if 'return' in annotations:
-            del annotations['return']
+# Статистика кэша результатов проверки, по аналогии с functools.lru_cache
+StrictCacheInfo = namedtuple('StrictCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
 
-        # Если есть аннотации, то проверяем соответствие типов
-        if annotations:
 
-            # Создаём словарь с переданными аргументами и их типами
-            signature = inspect.signature(func)
-            arguments = signature.bind(*args, **kwargs)
-            arguments = {argument: type(value) for argument, value in arguments.arguments.items()}
+# Контейнеры, для которых проверяются элементы: list[int], set[str], frozenset[float]
+ITEM_CONTAINERS = (list, set, frozenset)
 
-            for annotation, annotation_type in annotations.items():
-                if arguments.get(annotation) != annotation_type:
-                    raise TypeError('Несоответствие типов переданных аргументов объявленным в прототипе функции')
 
-        return func(*args, **kwargs)
+# Компиляция аннотации в пару функций проверки: check_value(value) проверяет значение,
+# check_type(type) - только тип значения. check_type равна None, если одного типа
+# недостаточно (например, для list[int] нужно проверить элементы), такие аннотации
+# не попадают в кэш результатов проверки.
+# depth - сколько элементов контейнера проверять: 1 - только первый, k - первые k, None - все.
+def compile_annotation(annotation, depth):
+
+    if annotation is Any:
+        return (lambda value: True), (lambda value_type: True)
+
+    if annotation is None:
+        annotation = type(None)
+
+    origin = get_origin(annotation)
+    arguments = get_args(annotation)
+
+    if origin is Annotated:
+        return compile_annotation(arguments[0], depth)
+
+    # Union[X, Y], Optional[X] и X | Y
+    if origin is Union or origin is UnionType:
+        members = [compile_annotation(argument, depth) for argument in arguments]
+        if all(check_type is not None for _, check_type in members):
+            # Поиск во множестве подходит, только если каждый член проверяется через type(x) is T;
+            # абстрактные классы и Any проверяются своими функциями
+            member_types = frozenset(plain_class(argument) for argument in arguments)
+            if None not in member_types:
+                return (lambda value: type(value) in member_types), (lambda value_type: value_type in member_types)
+            type_checks = [check_type for _, check_type in members]
+            return (
+                (lambda value: any(check_type(type(value)) for check_type in type_checks)),
+                (lambda value_type: any(check_type(value_type) for check_type in type_checks)),
+            )
+        value_checks = [check_value for check_value, _ in members]
+        return (lambda value: any(check_value(value) for check_value in value_checks)), None
+
+    if origin is None:
+        if isinstance(annotation, type):
+            # У абстрактных классов (Callable, Iterable, Sequence из collections.abc и т.п.) нет
+            # собственных экземпляров, поэтому для них проверяется isinstance, а не type(x) is T
+            if inspect.isabstract(annotation):
+                return (
+                    (lambda value: isinstance(value, annotation)),
+                    (lambda value_type: issubclass(value_type, annotation)),
+                )
+            return (lambda value: type(value) is annotation), (lambda value_type: value_type is annotation)
+        # Остальные конструкции typing (TypeVar, NewType и т.п.) не проверяются
+        return compile_annotation(Any, depth)
+
+    # Параметры, равные Any, не требуют проверки элементов
+    if all(argument is Any for argument in arguments) and origin is not tuple:
+        return compile_annotation(origin, depth)
+
+    if origin in ITEM_CONTAINERS:
+        check_item = compile_annotation(arguments[0], depth)[0]
+
+        def check_items(value):
+            if type(value) is not origin:
+                return False
+            items = value if depth is None else islice(value, depth)
+            return all(check_item(item) for item in items)
+
+        return check_items, None
+
+    if origin is dict:
+        check_key = compile_annotation(arguments[0], depth)[0]
+        check_item = compile_annotation(arguments[1], depth)[0]
+
+        def check_dict(value):
+            if type(value) is not dict:
+                return False
+            items = value.items() if depth is None else islice(value.items(), depth)
+            return all(check_key(key) and check_item(item) for key, item in items)
+
+        return check_dict, None
+
+    if origin is tuple:
+
+        # tuple[int, ...] - кортеж произвольной длины с однотипными элементами
+        if len(arguments) == 2 and arguments[1] is Ellipsis:
+            if arguments[0] is Any:
+                return compile_annotation(tuple, depth)
+            check_item = compile_annotation(arguments[0], depth)[0]
+
+            def check_homogeneous_tuple(value):
+                if type(value) is not tuple:
+                    return False
+                items = value if depth is None else value[:depth]
+                return all(check_item(item) for item in items)
+
+            return check_homogeneous_tuple, None
+
+        # tuple[int, str] - кортеж фиксированной длины, проверяется целиком
+        item_checks = tuple(compile_annotation(argument, depth)[0] for argument in arguments)
+        length = len(item_checks)
+
+        def check_fixed_tuple(value):
+            return (
+                type(value) is tuple
+                and len(value) == length
+                and all(check_item(item) for check_item, item in zip(item_checks, value))
+            )
+
+        return check_fixed_tuple, None
+
+    # Прочие параметризованные типы проверяются только по классу-оригиналу: Callable[[int], int] -
+    # как Callable, Sequence[int] и Iterable[int] - как Sequence и Iterable, без проверки элементов
+    # (обход Iterable мог бы исчерпать итератор)
+    if isinstance(origin, type):
+        return compile_annotation(origin, depth)
+
+    return compile_annotation(Any, depth)
+
+
+# Класс, если аннотация проверяется одним сравнением type(value) is класс, иначе None
+def plain_class(annotation):
+
+    if annotation is None:
+        return type(None)
+
+    if get_origin(annotation) is Annotated:
+        return plain_class(get_args(annotation)[0])
+
+    # С Python 3.11 typing.Any - тоже класс, но проверять по нему нечего;
+    # абстрактные классы проверяются через isinstance
+    if (isinstance(annotation, type) and get_origin(annotation) is None and annotation is not Any
+            and not inspect.isabstract(annotation)):
+        return annotation
+
+    return None
+
+
+# Проверка аргументов, связанных через inspect.signature().bind(), для вызовов с именованными аргументами
+def check_bound_arguments(signature, keyword_types, args, kwargs):
+
+    arguments = signature.bind(*args, **kwargs).arguments
+
+    for name, value in arguments.items():
+
+        if name not in keyword_types:
+            continue
+
+        check_value, kind = keyword_types[name]
+
+        # Для *args и **kwargs проверяем каждое переданное значение
+        if kind is inspect.Parameter.VAR_POSITIONAL:
+            values = value
+        elif kind is inspect.Parameter.VAR_KEYWORD:
+            values = value.values()
+        else:
+            values = (value,)
+
+        for item in values:
+            if not check_value(item):
+                raise TypeError(TYPE_ERROR_MESSAGE)
+
+
+# Настройки проверок @strict, общие для всего процесса; режим запоминается при декорировании,
+# поэтому set_strict_mode() действует на функции, декорированные после его вызова:
+# 'always' - проверять каждый вызов (по умолчанию);
+# 'off' - не проверять, декоратор возвращает исходную функцию без обёртки;
+# 'sample' - проверять один вызов из n для каждой функции;
+# 'first' - проверять только первые n вызовов из каждого места вызова. Поиск места вызова стоит
+# дороже самой проверки простых аргументов, поэтому после FIRST_MODE_SETTLE_CALLS вызовов подряд
+# из уже проверенных мест функция перестаёт искать место вызова и пропускает все проверки,
+# в том числе из новых мест вызова.
+STRICT_MODES = ('always', 'off', 'sample', 'first')
+
+FIRST_MODE_SETTLE_CALLS = 1000
+
+strict_settings = {'mode': 'always', 'n': 1}
+
+# Счётчики проверенных и пропущенных вызовов всех декорированных функций; в режиме 'off'
+# обёртки нет совсем, поэтому вызовы не считаются
+strict_stats = {'checked': 0, 'skipped': 0}
+
+
+def set_strict_mode(mode: str, n: int = 1) -> None:
+
+    if mode not in STRICT_MODES:
+        raise ValueError(f'Неизвестный режим проверок: {mode!r}, допустимые режимы: {", ".join(STRICT_MODES)}')
+
+    if n < 1:
+        raise ValueError('Параметр n должен быть положительным')
+
+    strict_settings['mode'] = mode
+    strict_settings['n'] = n
+
+
+def reset_strict_stats() -> None:
+    strict_stats['checked'] = 0
+    strict_stats['skipped'] = 0
+
+
+# Решение «не проверять» для функций, которым больше не нужно искать место вызова в режиме 'first'
+def skip_check() -> bool:
+    strict_stats['skipped'] += 1
+    return False
+
+
+# Проверка аргументов без кэша: каждый аргумент проверяется своей функцией. Если все параметры
+# позиционные и аннотированы обычными классами, позиционный вызов проверяется сравнением
+# type(args[i]) is T прямо в цикле, без вызова функций проверки и без построения кортежей
+def compile_direct_checker(signature, keyword_types, positional_checks, positional_count, keyword_positions,
+                           annotations):
+
+    plain_positions = tuple((index, plain_class(annotations[name])) for index, name, _, _ in positional_checks)
+    all_plain = len(positional_checks) == positional_count and all(cls is not None for _, cls in plain_positions)
+    value_checks = tuple((index, name, check_value) for index, name, check_value, _ in positional_checks)
+
+    def check_arguments(args, kwargs):
+
+        args_count = len(args)
+
+        if not kwargs and args_count == positional_count:
+            if all_plain:
+                for index, expected in plain_positions:
+                    if type(args[index]) is not expected:
+                        raise TypeError(TYPE_ERROR_MESSAGE)
+                return
+            for index, _, check_value in value_checks:
+                if not check_value(args[index]):
+                    raise TypeError(TYPE_ERROR_MESSAGE)
+        elif args_count + len(kwargs) == positional_count and all(
+            keyword_positions.get(name, -1) >= args_count for name in kwargs
+        ):
+            for index, name, check_value in value_checks:
+                if not check_value(args[index] if index < args_count else kwargs[name]):
+                    raise TypeError(TYPE_ERROR_MESSAGE)
+        else:
+            check_bound_arguments(signature, keyword_types, args, kwargs)
+
+    return check_arguments
+
+
+# Сборка функции проверки аргументов; всё, что не зависит от конкретного вызова, вычисляется один раз
+def compile_arguments_checker(func, annotations, cache_size, depth):
+
+    signature = inspect.signature(func)
+    parameters = list(signature.parameters.values())
+
+    # Каждая аннотация компилируется в функции проверки один раз
+    checks = {name: compile_annotation(annotation, depth) for name, annotation in annotations.items()}
+
+    # Позиционные параметры с аннотациями: (позиция, имя, проверка значения, проверка типа)
+    positional_checks = tuple(
+        (index, parameter.name, *checks[parameter.name])
+        for index, parameter in enumerate(parameters)
+        if parameter.kind in POSITIONAL_KINDS and parameter.name in annotations
+    )
+
+    # Словарь «имя аргумента -> (проверка значения, вид параметра)» для вызовов через bind()
+    keyword_types = {
+        parameter.name: (checks[parameter.name][0], parameter.kind)
+        for parameter in parameters
+        if parameter.name in annotations
+    }
+
+    # Быстрый путь без bind() возможен, только если все параметры позиционные
+    positional_count = len(parameters) if all(parameter.kind in POSITIONAL_KINDS for parameter in parameters) else -1
+
+    # Позиции параметров, которые можно передать по имени
+    keyword_positions = {
+        parameter.name: index
+        for index, parameter in enumerate(parameters)
+        if parameter.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD
+    }
+
+    cache = OrderedDict()
+    cache_stats = {'hits': 0, 'misses': 0}
+
+    def cache_info() -> StrictCacheInfo:
+        return StrictCacheInfo(cache_stats['hits'], cache_stats['misses'], cache_size, len(cache))
+
+    def cache_clear() -> None:
+        cache.clear()
+        cache_stats['hits'] = 0
+        cache_stats['misses'] = 0
+
+    # Если все аннотации - обычные классы, проверка type(x) is T дешевле обращения к кэшу,
+    # поэтому кэш не используется; так же работает и cache_size=0
+    if cache_size == 0 or all(plain_class(annotations[name]) is not None for _, name, _, _ in positional_checks):
+        check_arguments = compile_direct_checker(signature, keyword_types, positional_checks, positional_count,
+                                                 keyword_positions, annotations)
+        check_arguments.cache_info = cache_info
+        check_arguments.cache_clear = cache_clear
+        return check_arguments
+
+    # Параметры, проверку которых определяет один тип аргумента, проверяются через кэш;
+    # ключ кэша - кортеж их типов. Если такими являются все параметры, то для позиционного
+    # вызова ключ строится одним tuple(map(type, args))
+    shallow_positions = tuple((index, name) for index, name, _, check_type in positional_checks if check_type)
+    shallow_indexes = tuple(index for index, _ in shallow_positions)
+    type_checks = tuple(check_type for _, _, _, check_type in positional_checks if check_type)
+    all_shallow = len(shallow_positions) == positional_count
+
+    # Остальные параметры (контейнеры с проверкой элементов) проверяются на каждом вызове
+    deep_positions = tuple((index, name, check_value) for index, name, check_value, check_type in positional_checks if not check_type)
+
+    # LRU-кэш «кортеж типов -> прошла ли проверка» (cache) и статистика обращений к нему (cache_stats)
+    def check_arguments(args, kwargs):
+
+        args_count = len(args)
+
+        if not kwargs and args_count == positional_count:
+            if all_shallow:
+                key = tuple(map(type, args))
+            else:
+                key = tuple([type(args[index]) for index in shallow_indexes])
+            for index, _, check_value in deep_positions:
+                if not check_value(args[index]):
+                    raise TypeError(TYPE_ERROR_MESSAGE)
+        elif args_count + len(kwargs) == positional_count and all(
+            keyword_positions.get(name, -1) >= args_count for name in kwargs
+        ):
+            # Каждый параметр передан ровно один раз, поэтому bind() не нужен
+            key = tuple([
+                type(args[index]) if index < args_count else type(kwargs[name])
+                for index, name in shallow_positions
+            ])
+            for index, name, check_value in deep_positions:
+                if not check_value(args[index] if index < args_count else kwargs[name]):
+                    raise TypeError(TYPE_ERROR_MESSAGE)
+        else:
+            check_bound_arguments(signature, keyword_types, args, kwargs)
+            return
+
+        if not key:
+            return
+
+        passed = cache.get(key)
+
+        if passed is None:
+            cache_stats['misses'] += 1
+            passed = all(check_type(value_type) for check_type, value_type in zip(type_checks, key))
+            if cache_size:
+                cache[key] = passed
+                if len(cache) > cache_size:
+                    cache.popitem(last=False)
+        else:
+            cache_stats['hits'] += 1
+            # Между get() и move_to_end() другой поток мог вытеснить ключ из кэша;
+            # результат проверки уже получен, поэтому такой ключ просто не переносится
+            try:
+                cache.move_to_end(key)
+            except KeyError:
+                pass
+
+        if not passed:
+            raise TypeError(TYPE_ERROR_MESSAGE)
+
+    check_arguments.cache_info = cache_info
+    check_arguments.cache_clear = cache_clear
+
+    return check_arguments
+
+
+# Аннотации функции с вычисленными строковыми аннотациями (from __future__ import annotations);
+# если аннотацию вычислить нельзя, используется исходное значение
+def resolve_annotations(func) -> dict:
+    try:
+        return get_type_hints(func, include_extras=True)
+    except (NameError, TypeError):
+        return dict(func.__annotations__)
+
+
+# Аннотации возвращаемого значения генераторов: Generator[Y, S, R], Iterator[Y], Iterable[Y]
+# и их асинхронные аналоги. Возвращает пару (тип элементов, тип результата генератора),
+# непроверяемые части заменяются на Any
+def split_generator_annotation(annotation, is_async):
+
+    origin = get_origin(annotation)
+    arguments = get_args(annotation)
+
+    if is_async:
+        generator_origins = (collections.abc.AsyncGenerator, collections.abc.AsyncIterator, collections.abc.AsyncIterable)
+    else:
+        generator_origins = (collections.abc.Generator, collections.abc.Iterator, collections.abc.Iterable)
+
+    if origin not in generator_origins or not arguments:
+        return Any, Any
+
+    if origin is collections.abc.Generator:
+        return arguments[0], arguments[2]
+
+    return arguments[0], Any
+
+
+# Обёртка над генератором, которая проверяет каждый выданный элемент по мере выдачи,
+# не накапливая их; send(), throw() и close() передаются исходному генератору
+def checked_generator(generator, check_item, check_result):
+
+    try:
+        item = next(generator)
+    except StopIteration as stop:
+        result = stop.value
+    else:
+        while True:
+
+            if not check_item(item):
+                generator.close()
+                raise TypeError(RETURN_ERROR_MESSAGE)
+
+            try:
+                sent = yield item
+            except GeneratorExit:
+                generator.close()
+                raise
+            except BaseException as error:
+                try:
+                    item = generator.throw(error)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+            else:
+                try:
+                    item = generator.send(sent)
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+
+    if not check_result(result):
+        raise TypeError(RETURN_ERROR_MESSAGE)
+
+    return result
+
+
+def strict(func=None, *, cache_size: int = 128, depth: Optional[int] = 1, check_return: bool = False):
+
+    # Декоратор можно применять как @strict, так и @strict(cache_size=..., depth=..., check_return=...)
+    if func is None:
+        return partial(strict, cache_size=cache_size, depth=depth, check_return=check_return)
+
+    if cache_size < 0:
+        raise ValueError('Размер кэша не может быть отрицательным')
+
+    if depth is not None and depth < 1:
+        raise ValueError('Глубина проверки контейнеров должна быть положительной или None')
+
+    # Аннотации параметров функции; аннотация для 'return' проверяется, только если check_return=True
+    annotations = resolve_annotations(func)
+    return_annotation = annotations.pop('return', Any)
+
+    if not check_return:
+        return_annotation = Any
+
+    # Если проверять нечего или проверки выключены, то обёртка не нужна
+    if (not annotations and return_annotation is Any) or strict_settings['mode'] == 'off':
+        return func
+
+    check_arguments = compile_arguments_checker(func, annotations, cache_size, depth)
+
+    # Решение, проверять ли текущий вызов, нужно только в режимах 'sample' и 'first';
+    # в режиме 'always' should_check равна None и обёртки сразу вызывают проверку.
+    # should_check считает пропущенные вызовы, проверенные считают сами обёртки
+    mode = strict_settings['mode']
+    n = strict_settings['n']
+    should_check = None
+
+    if mode == 'sample':
+
+        # Сколько вызовов осталось до следующей проверки; проверяется первый вызов
+        countdown = 1
+
+        def should_check():
+            nonlocal countdown
+            countdown -= 1
+            if countdown:
+                strict_stats['skipped'] += 1
+                return False
+            countdown = n
+            return True
+
+    elif mode == 'first':
+
+        # Число проверенных вызовов из каждого места; место вызова - кадр, вызвавший обёртку,
+        # а для генераторов и корутин - кадр, который их запускает (первый next() или await)
+        callsite_calls = {}
+        skipped_in_row = 0
+
+        def should_check():
+            nonlocal should_check, skipped_in_row
+            caller = sys._getframe(2)
+            callsite = (caller.f_code, caller.f_lasti)
+            calls = callsite_calls.get(callsite, 0)
+            if calls < n:
+                callsite_calls[callsite] = calls + 1
+                skipped_in_row = 0
+                return True
+            strict_stats['skipped'] += 1
+            skipped_in_row += 1
+            # Обёртки читают should_check при каждом вызове, поэтому замена действует сразу
+            if skipped_in_row >= FIRST_MODE_SETTLE_CALLS:
+                should_check = skip_check
+                callsite_calls.clear()
+            return False
+
+    # Обёртки генераторов и корутин сами являются генераторами и корутинами, поэтому
+    # inspect.isgeneratorfunction(), inspect.iscoroutinefunction() и т.п. узнают их. Аргументы
+    # проверяются, когда начинает выполняться тело: при первом next(), async for или await
+    if inspect.isasyncgenfunction(func):
+
+        item_annotation, _ = split_generator_annotation(return_annotation, is_async=True)
+        check_item = None if item_annotation is Any else compile_annotation(item_annotation, depth)[0]
+
+        # В асинхронных генераторах нет yield from, поэтому asend(), athrow() и aclose()
+        # передаются исходному генератору вручную, как в checked_generator
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+
+            check = None
+            if should_check is None or should_check():
+                strict_stats['checked'] += 1
+                check_arguments(args, kwargs)
+                check = check_item
+
+            generator = func(*args, **kwargs)
+
+            try:
+                item = await generator.__anext__()
+            except StopAsyncIteration:
+                return
+
+            while True:
+
+                if check is not None and not check(item):
+                    await generator.aclose()
+                    raise TypeError(RETURN_ERROR_MESSAGE)
+
+                try:
+                    sent = yield item
+                except GeneratorExit:
+                    await generator.aclose()
+                    raise
+                except BaseException as error:
+                    try:
+                        item = await generator.athrow(error)
+                    except StopAsyncIteration:
+                        return
+                else:
+                    try:
+                        item = await generator.asend(sent)
+                    except StopAsyncIteration:
+                        return
+
+    elif inspect.isgeneratorfunction(func):
+
+        item_annotation, result_annotation = split_generator_annotation(return_annotation, is_async=False)
+        check_item = compile_annotation(item_annotation, depth)[0]
+        check_result = compile_annotation(result_annotation, depth)[0]
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+
+            if should_check is not None and not should_check():
+                return (yield from func(*args, **kwargs))
+
+            strict_stats['checked'] += 1
+            check_arguments(args, kwargs)
+
+            if item_annotation is Any and result_annotation is Any:
+                return (yield from func(*args, **kwargs))
+
+            return (yield from checked_generator(func(*args, **kwargs), check_item, check_result))
+
+    elif inspect.iscoroutinefunction(func):
+
+        check_result = None if return_annotation is Any else compile_annotation(return_annotation, depth)[0]
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+
+            if should_check is not None and not should_check():
+                return await func(*args, **kwargs)
+
+            strict_stats['checked'] += 1
+            check_arguments(args, kwargs)
+            result = await func(*args, **kwargs)
+
+            if check_result is not None and not check_result(result):
+                raise TypeError(RETURN_ERROR_MESSAGE)
+
+            return result
+
+    else:
+
+        check_result = None if return_annotation is Any else compile_annotation(return_annotation, depth)[0]
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+
+            if should_check is not None and not should_check():
+                return func(*args, **kwargs)
+
+            strict_stats['checked'] += 1
+            check_arguments(args, kwargs)
+            result = func(*args, **kwargs)
+
+            if check_result is not None and not check_result(result):
+                raise TypeError(RETURN_ERROR_MESSAGE)
+
+            return result
+
+    wrapper.cache_info = check_arguments.cache_info
+    wrapper.cache_clear = check_arguments.cache_clear
     return wrapper
 
 # --- Функции для тестирования ---
@@ -60,6 +662,11 @@ def only_return_annotated(a, b) -> int:
     """Функция с аннотацией только для возвращаемого значения."""
     return a + b
 
+@strict
+def scale_values(factor: int, *values: float, **labels: str) -> list:
+    """Функция с аннотированными *args и **kwargs."""
+    return [factor * value for value in values]
+
 
 class TestStrictDecorator(unittest.TestCase):
     """Тесты для декоратора @strict"""
@@ -158,11 +765,505 @@ class TestStrictDecorator(unittest.TestCase):
         with self.assertRaisesRegex(TypeError, "missing a required argument: 'b'"):
              sum_two(a=1, c=2) # 'b' отсутствует
 
+    def test_positional_and_keyword_calls_agree(self):
+        """Тест: быстрый позиционный путь и путь через bind() дают одинаковый результат."""
+        self.assertEqual(sum_two(1, 2), sum_two(1, b=2))
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            sum_two(1, b=2.0)
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            describe_item("яблоко", price=1.5, available=1)
+
+    def test_var_arguments_checked_per_value(self):
+        """Тест: для *args и **kwargs проверяется каждое переданное значение."""
+        self.assertEqual(scale_values(2, 1.5, 2.5, unit="кг"), [3.0, 5.0])
+        self.assertEqual(scale_values(2), [])
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            scale_values(2, 1.5, 2)
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            scale_values(2, 1.5, unit=1)
+
     def test_metadata_preservation(self):
         """Тест: сохранение метаданных декорированной функции."""
         self.assertEqual(sum_two.__name__, 'sum_two', "Имя функции должно сохраниться")
         self.assertEqual(sum_two.__doc__, "Суммирует два целых числа.", "Докстринг функции должен сохраниться")
 
 
+class TestStrictAnnotations(unittest.TestCase):
+    """Тесты для объединений, Optional, Any и параметризованных контейнеров"""
+
+    def test_union_and_optional(self):
+        """Тест: X | Y, Optional[X] и Union[X, Y] принимают значения любого из типов."""
+
+        @strict
+        def pick(a: int | None, b: Optional[str], c: Union[int, float]) -> str:
+            return f'{a}-{b}-{c}'
+
+        self.assertEqual(pick(None, None, 1.5), 'None-None-1.5')
+        self.assertEqual(pick(1, 'x', 2), '1-x-2')
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            pick(True, 'x', 2)  # bool не является int
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            pick(1, 2, 2)
+
+    def test_any(self):
+        """Тест: аргумент с аннотацией Any не проверяется."""
+
+        @strict
+        def wrap(value: Any, label: str) -> str:
+            return f'{label}: {value}'
+
+        self.assertEqual(wrap([1], 'список'), 'список: [1]')
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            wrap([1], 1)
+
+    def test_parametrized_containers(self):
+        """Тест: проверяется тип контейнера и его элементов."""
+
+        @strict
+        def total(values: list[int], weights: dict[str, float], tags: set[str], pair: tuple[int, str]) -> int:
+            return sum(values)
+
+        self.assertEqual(total([1, 2], {'a': 1.0}, {'x'}, (1, 'y')), 3)
+        self.assertEqual(total([], {}, set(), (1, 'y')), 0)
+        invalid_calls = [
+            ((1, 2), {'a': 1.0}, {'x'}, (1, 'y')),   # tuple вместо list
+            ([1.5], {'a': 1.0}, {'x'}, (1, 'y')),    # float в list[int]
+            ([1], {1: 1.0}, {'x'}, (1, 'y')),        # int-ключ в dict[str, float]
+            ([1], {'a': 1}, {'x'}, (1, 'y')),        # int-значение в dict[str, float]
+            ([1], {'a': 1.0}, {1}, (1, 'y')),        # int в set[str]
+            ([1], {'a': 1.0}, {'x'}, (1, 'y', 2)),   # неверная длина кортежа
+            ([1], {'a': 1.0}, {'x'}, ('y', 1)),      # неверный порядок типов в кортеже
+        ]
+        for args in invalid_calls:
+            with self.subTest(args=args), self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+                total(*args)
+
+    def test_homogeneous_tuple_and_depth(self):
+        """Тест: по умолчанию проверяется первый элемент, depth задаёт число проверяемых элементов."""
+
+        @strict
+        def first_only(values: tuple[int, ...]) -> int:
+            return len(values)
+
+        @strict(depth=2)
+        def first_two(values: list[int]) -> int:
+            return len(values)
+
+        @strict(depth=None)
+        def all_items(values: list[int]) -> int:
+            return len(values)
+
+        self.assertEqual(first_only((1, 'a')), 2)
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            first_only(('a', 1))
+
+        self.assertEqual(first_two([1, 2, 'a']), 3)
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            first_two([1, 'a', 3])
+
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            all_items([1, 2, 'a'])
+
+    def test_nested_and_keyword_calls(self):
+        """Тест: вложенные аннотации проверяются и при вызове с именованными аргументами."""
+
+        @strict
+        def lookup(table: dict[str, list[int] | None], key: str) -> int:
+            return len(table[key] or [])
+
+        self.assertEqual(lookup(table={'a': [1, 2]}, key='a'), 2)
+        self.assertEqual(lookup({'a': None}, key='a'), 0)
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            lookup(table={'a': ['x']}, key='a')
+
+    def test_abstract_classes_and_callables(self):
+        """Тест: Callable, Sequence, Iterable и другие абстрактные классы проверяются через isinstance."""
+
+        @strict
+        def apply(func: Callable[[int], int], values: collections.abc.Sequence[int], keys: Iterable[str]) -> list:
+            return [func(value) for value in values]
+
+        @strict
+        def call(func: Callable, items: typing.Sequence, size: collections.abc.Sized) -> int:
+            return func(items)
+
+        self.assertEqual(apply(abs, [-1, 2], {'a'}), [1, 2])
+        self.assertEqual(apply(lambda value: value * 2, (1,), iter(['x'])), [2])
+        self.assertEqual(apply(func=abs, values=range(2), keys='ab'), [0, 1])
+        self.assertEqual(call(len, 'abc', {}), 3)
+        invalid_calls = [
+            (1, [1], ['a']),        # не вызываемый объект
+            (abs, {1}, ['a']),      # set не является Sequence
+            (abs, [1], 1),          # int не является Iterable
+        ]
+        for args in invalid_calls:
+            with self.subTest(args=args), self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+                apply(*args)
+        with self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+            call(len, 'abc', 1)
+
+    def test_abstract_classes_and_any_in_unions(self):
+        """Тест: абстрактные классы и Any внутри Union проверяются так же, как вне его."""
+
+        @strict
+        def call(func: collections.abc.Callable | None, items: Optional[collections.abc.Sequence]) -> int:
+            return 0 if func is None else func(items)
+
+        @strict
+        def describe(value: Optional[Any], other: Union[int, Any]) -> str:
+            return f'{value}{other}'
+
+        self.assertEqual(call(len, [1]), 1)
+        self.assertEqual(call(None, (1, 2)), 0)
+        self.assertEqual(call(func=len, items='ab'), 2)
+        self.assertEqual(describe('a', 'b'), 'ab')
+        self.assertEqual(describe(None, 1.5), 'None1.5')
+        for args in ((1, [1]), (len, {1}), (len, 1)):
+            with self.subTest(args=args), self.assertRaisesRegex(TypeError, TYPE_ERROR_MESSAGE):
+                call(*args)
+
+    def test_invalid_depth(self):
+        """Тест: неположительная глубина проверки отклоняется."""
+        with self.assertRaises(ValueError):
+            strict(depth=0)(sum_two)
+
+
+class TestStrictReturnAndAsync(unittest.TestCase):
+    """Тесты для проверки возвращаемых значений, корутин и генераторов"""
+
+    error_message = "Несоответствие типов переданных аргументов объявленным в прототипе функции"
+    return_error_message = "Несоответствие типа возвращаемого значения объявленному в прототипе функции"
+
+    def test_return_check_is_opt_in(self):
+        """Тест: возвращаемое значение проверяется только при check_return=True."""
+
+        def halve(a: int) -> int:
+            return a / 2
+
+        self.assertEqual(strict(halve)(3), 1.5)
+        with self.assertRaisesRegex(TypeError, self.return_error_message):
+            strict(check_return=True)(halve)(3)
+
+        # Аннотирован только результат: без check_return обёртка не создаётся
+        self.assertIs(strict(only_return_annotated), only_return_annotated)
+        checked = strict(check_return=True)(only_return_annotated)
+        self.assertEqual(checked(1, 2), 3)
+        with self.assertRaisesRegex(TypeError, self.return_error_message):
+            checked(1, 2.0)
+
+    def test_coroutine_arguments_and_result(self):
+        """Тест: корутина проверяет аргументы и результат после await."""
+
+        @strict(check_return=True)
+        async def fetch(key: str, broken: bool) -> int:
+            return key if broken else len(key)
+
+        self.assertTrue(inspect.iscoroutine(coroutine := fetch('abc', False)))
+        self.assertEqual(asyncio.run(coroutine), 3)
+        with self.assertRaisesRegex(TypeError, self.return_error_message):
+            asyncio.run(fetch('abc', True))
+        # Аргументы, как и тело корутины, проверяются при await
+        coroutine = fetch(1, False)
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            asyncio.run(coroutine)
+
+    def test_generator_items_checked_lazily(self):
+        """Тест: элементы генератора проверяются по мере выдачи, без накопления."""
+        produced = []
+
+        @strict(check_return=True)
+        def numbers(count: int) -> Iterator[int]:
+            for value in range(count):
+                produced.append(value)
+                yield value
+            yield 'конец'
+
+        generator = numbers(3)
+        self.assertTrue(inspect.isgenerator(generator))
+        self.assertEqual(next(generator), 0)
+        self.assertEqual(produced, [0])
+        self.assertEqual([next(generator), next(generator)], [1, 2])
+        with self.assertRaisesRegex(TypeError, self.return_error_message):
+            next(generator)
+        # Аргументы, как и тело генератора, проверяются при первом next()
+        generator = numbers('3')
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            next(generator)
+
+    def test_generator_send_and_result(self):
+        """Тест: send() передаётся исходному генератору, результат генератора проверяется."""
+
+        @strict(check_return=True)
+        def accumulate(start: int) -> Generator[int, int, str]:
+            total = start
+            while total < 10:
+                total += yield total
+            return str(total)
+
+        generator = accumulate(1)
+        self.assertEqual(next(generator), 1)
+        self.assertEqual(generator.send(4), 5)
+        with self.assertRaises(StopIteration) as stop:
+            generator.send(5)
+        self.assertEqual(stop.exception.value, '10')
+
+    def test_async_generator_items(self):
+        """Тест: элементы асинхронного генератора проверяются по мере выдачи."""
+
+        @strict(check_return=True)
+        async def ticks(values: list[int]) -> AsyncIterator[int]:
+            for value in values:
+                yield value
+
+        async def collect(values):
+            return [value async for value in ticks(values)]
+
+        self.assertTrue(inspect.isasyncgen(ticks([1])))
+        self.assertEqual(asyncio.run(collect([1, 2, 3])), [1, 2, 3])
+        with self.assertRaisesRegex(TypeError, self.return_error_message):
+            asyncio.run(collect([1, 2.5]))
+        with self.assertRaisesRegex(TypeError, self.error_message):
+            asyncio.run(collect((1, 2)))
+
+    def test_wrappers_keep_function_kind(self):
+        """Тест: обёртки генераторов и корутин распознаются как функции того же вида."""
+
+        @strict
+        async def fetch(key: str) -> int:
+            return len(key)
+
+        @strict(check_return=True)
+        def numbers(count: int) -> Iterator[int]:
+            yield from range(count)
+
+        @strict(check_return=True)
+        async def ticks(count: int) -> AsyncIterator[int]:
+            for value in range(count):
+                yield value
+
+        self.assertTrue(inspect.iscoroutinefunction(fetch))
+        self.assertTrue(asyncio.iscoroutinefunction(fetch))
+        self.assertTrue(inspect.isgeneratorfunction(numbers))
+        self.assertTrue(inspect.isasyncgenfunction(ticks))
+        self.assertFalse(inspect.iscoroutinefunction(numbers))
+        self.assertFalse(inspect.isgeneratorfunction(sum_two))
+
+
+class TestStrictCache(unittest.TestCase):
+    """Тесты для кэша результатов проверки типов"""
+
+    def test_repeated_type_shape_hits_cache(self):
+        """Тест: повторный вызов с теми же типами аргументов берётся из кэша."""
+
+        @strict
+        def multiply(a: int | float, b: int) -> float:
+            return a * b
+
+        multiply(1, 2)
+        multiply(3, 4)
+        multiply(a=5, b=6)
+        info = multiply.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 1))
+
+    def test_failed_shape_is_cached_and_bool_rejected(self):
+        """Тест: неудачная проверка тоже кэшируется, bool не принимается вместо int."""
+
+        @strict
+        def multiply(a: int | float, b: int) -> float:
+            return a * b
+
+        multiply(1, 2)
+        for _ in range(2):
+            with self.assertRaises(TypeError):
+                multiply(True, 2)
+        info = multiply.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+
+    def test_plain_classes_skip_cache(self):
+        """Тест: аннотации-классы проверяются напрямую, без кэша, с той же семантикой type(x) is T."""
+
+        @strict
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        self.assertEqual(multiply(2, 3), 6)
+        self.assertEqual(multiply(2, b=3), 6)
+        for args in ((True, 2), (2, 3.0), (2, None)):
+            with self.subTest(args=args), self.assertRaises(TypeError):
+                multiply(*args)
+        self.assertEqual(multiply.cache_info(), StrictCacheInfo(0, 0, 128, 0))
+
+    def test_lru_eviction_and_clear(self):
+        """Тест: при переполнении вытесняется давно не использованный ключ."""
+
+        @strict(cache_size=2)
+        def combine(a: int, b: str | bytes) -> str:
+            return f'{a}{b}'
+
+        combine(1, 'a')
+        with self.assertRaises(TypeError):
+            combine(1, 2)
+        combine(2, 'b')                      # (int, str) становится последним использованным
+        with self.assertRaises(TypeError):
+            combine(1.5, 'c')                # вытесняет (int, int)
+        with self.assertRaises(TypeError):
+            combine(1, 2)                    # снова промах
+        self.assertEqual(combine.cache_info(), StrictCacheInfo(1, 4, 2, 2))
+
+        combine.cache_clear()
+        self.assertEqual(combine.cache_info(), StrictCacheInfo(0, 0, 2, 0))
+
+    def test_cache_disabled(self):
+        """Тест: при cache_size=0 проверки работают без кэша."""
+
+        @strict(cache_size=0)
+        def multiply(a: int | float, b: int) -> float:
+            return a * b
+
+        self.assertEqual(multiply(2.5, 2), 5.0)
+        with self.assertRaises(TypeError):
+            multiply(2, 3.0)
+        self.assertEqual(multiply.cache_info(), StrictCacheInfo(0, 0, 0, 0))
+
+
+class TestStrictModes(unittest.TestCase):
+    """Тесты для режимов проверок @strict"""
+
+    def setUp(self):
+        reset_strict_stats()
+
+    def tearDown(self):
+        set_strict_mode('always')
+        reset_strict_stats()
+
+    def test_default_mode_checks_every_call(self):
+        """Тест: по умолчанию проверяется и считается каждый вызов."""
+        for _ in range(3):
+            sum_two(1, 2)
+        with self.assertRaises(TypeError):
+            sum_two(1, 2.0)
+        self.assertEqual(strict_stats, {'checked': 4, 'skipped': 0})
+
+    def test_mode_is_bound_at_decoration(self):
+        """Тест: режим запоминается при декорировании и не меняется у уже декорированных функций."""
+        set_strict_mode('sample', n=100)
+
+        @strict
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        set_strict_mode('always')
+        with self.assertRaises(TypeError):
+            multiply(2, 2.5)  # 1-й вызов проверяется
+        self.assertEqual(multiply(2, 2.5), 5.0)
+        with self.assertRaises(TypeError):
+            sum_two(1, 2.0)
+        self.assertEqual(strict_stats, {'checked': 2, 'skipped': 1})
+
+    def test_off_mode_returns_original_function(self):
+        """Тест: в режиме 'off' декоратор возвращает исходную функцию."""
+        set_strict_mode('off')
+
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        self.assertIs(strict(multiply), multiply)
+        self.assertEqual(strict(multiply)(2, 2.5), 5.0)
+
+    def test_sample_mode_checks_one_in_n(self):
+        """Тест: в режиме 'sample' проверяется один вызов из n."""
+        set_strict_mode('sample', n=3)
+
+        @strict
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        with self.assertRaises(TypeError):
+            multiply(2, 2.5)  # 1-й вызов проверяется
+        self.assertEqual(multiply(2, 2.5), 5.0)  # 2-й и 3-й пропускаются
+        self.assertEqual(multiply(2, 2.5), 5.0)
+        with self.assertRaises(TypeError):
+            multiply(2, 2.5)  # 4-й снова проверяется
+        self.assertEqual(strict_stats, {'checked': 2, 'skipped': 2})
+
+    def test_first_mode_checks_first_calls_per_callsite(self):
+        """Тест: в режиме 'first' проверяются первые n вызовов из каждого места вызова."""
+        set_strict_mode('first', n=2)
+
+        @strict
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        results = [multiply(2, 3) for _ in range(5)]
+        self.assertEqual(results, [6] * 5)
+        self.assertEqual(strict_stats, {'checked': 2, 'skipped': 3})
+
+        # Новое место вызова проверяется независимо от предыдущего
+        with self.assertRaises(TypeError):
+            multiply(2, 2.5)
+
+    def test_first_mode_settles_after_checked_callsites(self):
+        """Тест: после FIRST_MODE_SETTLE_CALLS пропусков подряд место вызова больше не ищется."""
+        set_strict_mode('first', n=2)
+
+        @strict
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        for _ in range(FIRST_MODE_SETTLE_CALLS + 2):
+            multiply(2, 3)
+        self.assertEqual(strict_stats, {'checked': 2, 'skipped': FIRST_MODE_SETTLE_CALLS})
+
+        # Новые места вызова после этого тоже не проверяются
+        self.assertEqual(multiply(2, 2.5), 5.0)
+        self.assertEqual(strict_stats, {'checked': 2, 'skipped': FIRST_MODE_SETTLE_CALLS + 1})
+
+    def test_first_mode_callsite_of_generators_and_coroutines(self):
+        """Тест: в режиме 'first' у генераторов и корутин место вызова - место их запуска."""
+        set_strict_mode('first', n=1)
+
+        @strict
+        def numbers(count: int) -> Iterator[int]:
+            yield from range(count)
+
+        @strict
+        async def double(value: int) -> int:
+            return value * 2
+
+        @strict
+        async def ticks(count: int) -> AsyncIterator[int]:
+            for value in range(count):
+                yield value
+
+        async def collect(count):
+            return [value async for value in ticks(count)]
+
+        async def double_all(values):
+            return [await double(value) for value in values]
+
+        async def double_one(value):
+            return await double(value)
+
+        # Генераторы созданы в разных местах, а запускаются из одного: проверяется только первый запуск
+        generators = [numbers(2), numbers(2), numbers(2)]
+        self.assertEqual([list(generator) for generator in generators], [[0, 1]] * 3)
+        self.assertEqual(asyncio.run(double_all(range(3))), [0, 2, 4])
+        self.assertEqual(asyncio.run(collect(2)) + asyncio.run(collect(2)), [0, 1, 0, 1])
+        self.assertEqual(strict_stats, {'checked': 3, 'skipped': 5})
+
+        # Новые места запуска проверяются
+        with self.assertRaises(TypeError):
+            next(numbers('2'))
+        with self.assertRaises(TypeError):
+            asyncio.run(double_one(1.5))
+
+    def test_unknown_mode(self):
+        """Тест: неизвестный режим и некорректное n отклоняются."""
+        with self.assertRaises(ValueError):
+            set_strict_mode('never')
+        with self.assertRaises(ValueError):
+            set_strict_mode('sample', n=0)
+
+
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
\ No newline at end of file
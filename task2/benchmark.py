@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+import csv
+from functools import partial
+from itertools import cycle
+import os
+import sys
+import tempfile
+import time
+
+from solution import EXTRACTORS, FixtureCategoryServer, crawl_animals, scrape_animals
+
+
+# Количество зверей на каждую букву из сохранённого результата обхода настоящей категории
+def read_counts(path: str = 'beasts.csv') -> dict[str, int]:
+    with open(path, encoding='utf-8', newline='') as file:
+        return {letter: int(count) for letter, count in csv.reader(file)}
+
+
+# Страниц в секунду и время полного обхода тестовой категории последовательным циклом,
+# асинхронным обходом одной цепочки и обходом по буквам
+def run_benchmark(latency: float = 0.02):
+
+    counts = read_counts(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'beasts.csv'))
+
+    cases = [
+        ('последовательный цикл', lambda address, path: scrape_animals(address, path, verbose=False)),
+        ('асинхронный, concurrency=1', lambda address, path: crawl_animals(address, path, 1, verbose=False)),
+        ('асинхронный, concurrency=4', lambda address, path: crawl_animals(address, path, 4, verbose=False)),
+        ('по буквам, shards=4', lambda address, path: crawl_animals(address, path, 4, verbose=False, shards=4)),
+        ('по буквам, shards=16', lambda address, path: crawl_animals(address, path, 16, verbose=False, shards=16)),
+    ]
+
+    print(f'{"обход":<32}{"страниц":>10}{"время":>12}{"страниц/с":>12}')
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        output_path = os.path.join(directory, 'beasts.csv')
+
+        for title, crawl in cases:
+            with FixtureCategoryServer(counts, latency=latency) as server:
+                started = time.perf_counter()
+                crawl(server.address, output_path)
+                elapsed = time.perf_counter() - started
+                pages = server.requests
+
+            print(f'{title:<32}{pages:>10}{elapsed:>10.2f} с{pages / elapsed:>12.1f}')
+
+
+# Страница тестового сервера, обёрнутая в разметку размером с шапку, меню и подвал настоящей
+# страницы Википедии (около 100 КБ HTML вокруг списка)
+def wrap_like_wikipedia(page: str) -> str:
+
+    menu = ''.join(f'<li id="n-{index}"><a href="/wiki/Служебная:{index}" title="Раздел {index}">'
+                   f'<span>Раздел {index}</span></a></li>' for index in range(300))
+    head = (f'<head>{"<link rel=stylesheet href=/w/load.php>" * 40}<script>{"var x = 1;" * 2000}</script></head>'
+            f'<body><div id="mw-navigation"><div class="vector-menu"><ul>{menu}</ul></div></div>')
+    footer = f'<div id="footer"><ul>{menu}</ul></div>'
+
+    body_start = page.index('<div id="mw-pages">')
+    body_end = page.index('</body>')
+
+    return page[:page.index('<head>')] + head + page[body_start:body_end] + footer + page[body_end:]
+
+
+# Страницы тестовой категории, сохранённые на диск и прочитанные обратно, как записанные ответы сервера
+def record_fixture_pages(counts: dict[str, int]) -> list[str]:
+
+    server = FixtureCategoryServer(counts)
+    server.server.server_close()
+    pages = [server.render_page(start) for start in range(0, len(server.names), server.page_size)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for index, page in enumerate(pages):
+            with open(os.path.join(directory, f'{index:04d}.html'), 'w', encoding='utf-8') as file:
+                file.write(page)
+        pages = []
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), encoding='utf-8') as file:
+                pages.append(file.read())
+
+    return pages
+
+
+# Время разбора одной страницы каждым способом по страницам тестового сервера
+def run_parse_benchmark():
+
+    pages = record_fixture_pages(read_counts(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'beasts.csv')))
+
+    cases = [('страницы сервера', pages), ('с разметкой Википедии', [wrap_like_wikipedia(page) for page in pages])]
+
+    print(f'{"страницы":<28}' + ''.join(f'{extractor:>16}' for extractor in EXTRACTORS) + f'{"ускорение":>12}')
+
+    for title, texts in cases:
+        times = []
+        for extract in EXTRACTORS.values():
+            started = time.perf_counter()
+            for text in texts:
+                extract(text)
+            times.append((time.perf_counter() - started) / len(texts) * 1000)
+
+        print(f'{title:<28}' + ''.join(f'{elapsed:>13.2f} мс' for elapsed in times) + f'{times[1] / times[0]:>11.1f}x')
+
+
+# Разбор одной записанной страницы способом extractor; страницы берутся по кругу
+@contextmanager
+def parse_case(extractor: str, wikipedia_chrome: bool = False):
+    pages = record_fixture_pages(read_counts(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'beasts.csv')))
+    if wikipedia_chrome:
+        pages = [wrap_like_wikipedia(page) for page in pages]
+    extract = EXTRACTORS[extractor]
+    pages = cycle(pages)
+    yield lambda: extract(next(pages))
+
+
+# Полный обход тестовой категории из 12 страниц (в 20 раз меньше настоящей) без задержки сети
+@contextmanager
+def fetch_case(crawl):
+    counts = read_counts(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'beasts.csv'))
+    counts = {letter: count // 20 + 1 for letter, count in counts.items()}
+    with tempfile.TemporaryDirectory() as directory, FixtureCategoryServer(counts) as server:
+        output_path = os.path.join(directory, 'beasts.csv')
+        yield lambda: crawl(server.address, output_path, verbose=False)
+
+
+# Замеры для общего запуска из корня репозитория (../benchmark.py): имя -> контекстный менеджер,
+# который готовит данные и отдаёт замеряемый вызов без аргументов
+BENCHMARKS = {
+    **{f'scrape.parse_{extractor}': partial(parse_case, extractor) for extractor in EXTRACTORS},
+    **{f'scrape.parse_{extractor}_wikipedia': partial(parse_case, extractor, True) for extractor in EXTRACTORS},
+    'scrape.fetch_sequential': partial(fetch_case, scrape_animals),
+    'scrape.fetch_async': partial(fetch_case, crawl_animals),
+    'scrape.fetch_sharded': partial(fetch_case, partial(crawl_animals, concurrency=8, shards=8)),
+}
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['parse']:
+        run_parse_benchmark()
+    else:
+        run_benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 0.02)
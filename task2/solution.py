@@ -1,49 +1,1337 @@
+import asyncio
 import csv
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
+import html
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, quote, urlsplit
+
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
-def scrape_animals():
+WIKI_ADDRESS = 'https://ru.wikipedia.org'
 
-    wiki_address = 'https://ru.wikipedia.org'
+START_PAGE = '/wiki/Категория:Животные_по_алфавиту'
 
-    next_page = '/wiki/Категория:Животные_по_алфавиту'
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
 
-    beasts_dict = {}
+# Ссылка на следующую страницу категории; нужна до полного разбора страницы,
+# чтобы начать скачивать следующую страницу, пока разбирается текущая
+NEXT_PAGE_PATTERN = re.compile(r'<a\s[^>]*href="([^"]*)"[^>]*>Следующая страница</a>')
 
-    i = 1
+NEXT_PAGE_TEXT = 'Следующая страница'
 
-    while next_page is not None:
+# Блок страниц категории и следующий за ним блок файлов. Выше блока страниц на Википедии идут шапка,
+# меню и блок подкатегорий, ниже - блок файлов; у подкатегорий и файлов свои списки и свои ссылки
+# «Следующая страница», поэтому все способы разбора смотрят только на участок между этими блоками
+PAGES_SECTION_START = '<div id="mw-pages"'
 
-        status_code = 0
+PAGES_SECTION_END = '<div id="mw-category-media"'
 
-        while status_code != 200:
+# Буквы в порядке страниц категории; начала участков при обходе по буквам берутся из них
+SHARD_LETTERS = 'АБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЭЮЯ' + 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
 
-            r = requests.get(wiki_address + next_page, headers={'User-Agent': 'Mozilla/5.0'})
-            status_code = r.status_code
 
-            soup = BeautifulSoup(r.text, 'html.parser')
+# Участок страницы с блоком страниц категории (см. PAGES_SECTION_START); без этого блока - вся страница
+def pages_section(text: str) -> str:
 
-            beasts = soup.select('div.mw-category.mw-category-columns ul')
+    start = text.find(PAGES_SECTION_START)
+    if start < 0:
+        return text
 
-            current_page_beasts = [beast.get_text() for ul in beasts for beast in ul.find_all('a')]
-            print(f'Звери со страницы № {i}: {current_page_beasts}')
+    end = text.find(PAGES_SECTION_END, start)
+    return text[start:end] if end >= 0 else text[start:]
+
+
+# Ссылка на следующую страницу категории, найденная регулярным выражением без разбора HTML
+def find_next_page(text: str) -> str | None:
+
+    match = NEXT_PAGE_PATTERN.search(pages_section(text))
+    return html.unescape(match.group(1)) if match else None
+
+
+# Разбор страницы категории через дерево BeautifulSoup: список зверей и ссылка на следующую страницу
+def extract_page_soup(text: str) -> tuple[list[str], str | None]:
+
+    soup = BeautifulSoup(pages_section(text), 'html.parser')
+
+    beasts = soup.select('div.mw-category.mw-category-columns ul')
+
+    next_page = soup.find('a', string=NEXT_PAGE_TEXT)
+
+    beasts = [beast.get_text() for ul in beasts for beast in ul.find_all('a')]
+
+    return beasts, next_page.get('href') if next_page is not None else None
+
+
+class StopParsing(Exception):
+    pass
+
+
+# Потоковый разбор без дерева: запоминаются только тексты ссылок внутри списков
+# div.mw-category.mw-category-columns и адрес ссылки «Следующая страница».
+# Разбор останавливается, как только список зверей закончился и ссылка уже найдена
+class CategoryPageParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__()
+        self.beasts = []
+        self.next_page = None
+        self.category_depth = 0
+        self.list_depth = 0
+        self.link_href = None
+        self.link_text = None
+
+    def handle_starttag(self, tag, attrs):
+
+        if tag == 'div':
+            if self.category_depth:
+                self.category_depth += 1
+            else:
+                classes = (dict(attrs).get('class') or '').split()
+                if 'mw-category' in classes and 'mw-category-columns' in classes:
+                    self.category_depth = 1
+
+        elif tag == 'ul' and self.category_depth:
+            self.list_depth += 1
+
+        elif tag == 'a':
+            self.link_href = dict(attrs).get('href')
+            self.link_text = []
+
+    def handle_endtag(self, tag):
+
+        if tag == 'div' and self.category_depth:
+            self.category_depth -= 1
+            if not self.category_depth and self.next_page is not None:
+                raise StopParsing
+
+        elif tag == 'ul' and self.list_depth:
+            self.list_depth -= 1
+
+        elif tag == 'a' and self.link_text is not None:
+            text = ''.join(self.link_text)
+            if self.list_depth:
+                self.beasts.append(text)
+            elif self.next_page is None and text == NEXT_PAGE_TEXT:
+                self.next_page = self.link_href
+            self.link_text = None
+
+    def handle_data(self, data):
+        if self.link_text is not None:
+            self.link_text.append(data)
+
+
+def extract_page_stream(text: str) -> tuple[list[str], str | None]:
+
+    parser = CategoryPageParser()
+    try:
+        parser.feed(pages_section(text))
+        parser.close()
+    except StopParsing:
+        pass
+
+    return parser.beasts, parser.next_page
+
+
+# Способы разбора страницы категории; новый способ - функция, которая по тексту страницы
+# возвращает список зверей и ссылку на следующую страницу (None на последней)
+EXTRACTORS = {
+    'stream': extract_page_stream,
+    'soup': extract_page_soup,
+}
+
+
+def extract_page(text: str, extractor: str = 'stream') -> tuple[list[str], str | None]:
+
+    if extractor not in EXTRACTORS:
+        raise ValueError(f'Неизвестный способ разбора: {extractor!r}, допустимые: {", ".join(EXTRACTORS)}')
 
-            for beast in current_page_beasts:
-                letter = beast[0].upper()
-                beasts_dict[letter] = beasts_dict.setdefault(letter, 0) + 1
+    return EXTRACTORS[extractor](text)
 
-            next_page = soup.find('a', string='Следующая страница')
 
-            if next_page is not None:
-                next_page = next_page.get('href')
-                i += 1
+# Функция для получения списка зверей со страницы категории
+def parse_beasts(text: str, extractor: str = 'stream') -> list[str]:
+    return extract_page(text, extractor)[0]
 
-    with open('beasts.csv', mode='w', encoding='utf-8', newline='') as file:
+
+# Функция для подсчёта зверей по первой букве
+def count_beasts(beasts: list[str], beasts_dict: dict[str, int]) -> None:
+
+    for beast in beasts:
+        letter = beast[0].upper()
+        beasts_dict[letter] = beasts_dict.setdefault(letter, 0) + 1
+
+
+# Функция для записи количества зверей на каждую букву в CSV
+def write_beasts(beasts_dict: dict[str, int], output_path: str = 'beasts.csv') -> None:
+
+    with open(output_path, mode='w', encoding='utf-8', newline='') as file:
         writer = csv.writer(file)
         for letter, count in beasts_dict.items():
             writer.writerow([letter, count])
-        print(f'Звери подсчитаны на {i} страницах и записаны в файл beasts.csv')
+
+
+# Ограничение частоты запросов: не больше rate запросов в секунду на все цепочки страниц
+class RateLimiter:
+
+    def __init__(self, rate: float | None):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+
+        if not self.interval:
+            return
+
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_time > now:
+                await asyncio.sleep(self.next_time - now)
+                now = self.next_time
+            self.next_time = now + self.interval
+
+
+# Сессия requests с общим пулом соединений на pool_size одновременных запросов
+def create_session(pool_size: int = 1) -> requests.Session:
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+# Ответы, после которых запрос стоит повторить: сервер перегружен или временно недоступен
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+# Счётчики запросов: всего отправлено, сколько из них повторы, сколько оборвались по сети
+# или таймауту, суммарное и максимальное время ответа в секундах. Асинхронный обход обновляет
+# счётчики из потоков asyncio.to_thread, поэтому изменения идут под блокировкой
+class FetchStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, error: bool = False) -> None:
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+            self.latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def record_retry(self) -> None:
+        with self.lock:
+            self.retries += 1
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency / self.requests if self.requests else 0.0
+
+    def __repr__(self) -> str:
+        return (f'запросов: {self.requests}, повторов: {self.retries}, ошибок сети: {self.errors}, '
+                f'среднее время ответа: {self.mean_latency * 1000:.1f} мс, '
+                f'максимальное: {self.max_latency * 1000:.1f} мс')
+
+
+# Кэш ответов на диске: один JSON-файл на адрес с текстом страницы, ETag, Last-Modified и временем
+# последней проверки. В течение ttl секунд страница берётся из кэша без запроса, после этого сервер
+# спрашивают, изменилась ли она (If-None-Match / If-Modified-Since), и скачивают заново, только если
+# изменилась. hits - ответы из кэша без запроса, revalidated - ответы 304, misses - скачанные страницы;
+# как и FetchStats, счётчики изменяются под блокировкой
+class ResponseCache:
+
+    def __init__(self, directory: str, ttl: float = 24 * 60 * 60, clock=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f'из кэша: {self.hits}, не изменились (304): {self.revalidated}, скачано: {self.misses}'
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest() + '.json')
+
+    def lookup(self, url: str) -> dict | None:
+
+        try:
+            with open(self.path(url), encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        return entry if entry.get('url') == url else None
+
+    def is_fresh(self, entry: dict) -> bool:
+        return self.clock() - entry['stored_at'] < self.ttl
+
+    # Заголовки условного запроса для устаревшей записи
+    @staticmethod
+    def validators(entry: dict | None) -> dict[str, str]:
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    @staticmethod
+    def response(entry: dict) -> requests.Response:
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response.encoding = 'utf-8'
+        response._content = entry['text'].encode('utf-8')
+
+        return response
+
+    def save(self, entry: dict) -> None:
+
+        # Запись через временный файл, чтобы оборванный запуск не оставил в кэше половину страницы
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+                json.dump(entry, file, ensure_ascii=False)
+            os.replace(temporary_path, self.path(entry['url']))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    # Свежая запись из кэша или None, если нужен запрос к серверу
+    def get(self, url: str) -> tuple[requests.Response | None, dict | None]:
+
+        entry = self.lookup(url)
+        if entry is not None and self.is_fresh(entry):
+            with self.lock:
+                self.hits += 1
+            return self.response(entry), entry
+
+        return None, entry
+
+    # Учёт ответа сервера: 304 продлевает запись, новый ответ её заменяет
+    def update(self, url: str, entry: dict | None, response: requests.Response) -> requests.Response:
+
+        if response.status_code == 304 and entry is not None:
+            with self.lock:
+                self.revalidated += 1
+            entry['stored_at'] = self.clock()
+            self.save(entry)
+            return self.response(entry)
+
+        with self.lock:
+            self.misses += 1
+        self.save({
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': self.clock(),
+            'text': response.text,
+        })
+
+        return response
+
+
+# Загрузка страниц с повторами: ответы из RETRY_STATUSES, обрывы соединения и таймауты повторяются
+# не больше max_attempts раз с экспоненциальной задержкой backoff * 2 ** попытка (не больше max_backoff)
+# и случайным разбросом от нуля до этой величины. Если сервер прислал Retry-After, ждём столько,
+# сколько он просит. Возвращается только успешный ответ: ответ с ошибкой или последнее
+# исключение после исчерпания попыток выбрасываются, поэтому в подсчёт такие страницы не попадают.
+# cache - необязательный ResponseCache, через который проходят все страницы
+class Fetcher:
+
+    def __init__(self, session: requests.Session | None = None, max_attempts: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 30.0, timeout: float = 30.0, sleep=time.sleep,
+                 cache: ResponseCache | None = None):
+
+        if max_attempts < 1:
+            raise ValueError('Число попыток должно быть положительным')
+
+        self.session = session if session is not None else create_session()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.sleep = sleep
+        self.cache = cache
+        self.stats = FetchStats()
+
+    def __enter__(self) -> 'Fetcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    # Задержка перед повтором номер attempt (с нуля)
+    def retry_delay(self, attempt: int, response: requests.Response | None = None) -> float:
+
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+
+        if retry_after is not None:
+            if retry_after.strip().isdigit():
+                return float(retry_after)
+            try:
+                return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    # Один запрос: ответ, если повторять не нужно, иначе задержка перед следующей попыткой
+    def attempt(self, url: str, attempt: int, headers: dict[str, str] | None = None) -> requests.Response | float:
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            self.stats.record(time.perf_counter() - started, error=True)
+            if attempt + 1 == self.max_attempts:
+                raise
+            response = None
+        else:
+            self.stats.record(time.perf_counter() - started)
+            if response.status_code not in RETRY_STATUSES or attempt + 1 == self.max_attempts:
+                response.raise_for_status()
+                return response
+
+        self.stats.record_retry()
+        return self.retry_delay(attempt, response)
+
+    def fetch(self, url: str) -> requests.Response:
+
+        entry = None
+        if self.cache is not None:
+            cached, entry = self.cache.get(url)
+            if cached is not None:
+                return cached
+
+        headers = ResponseCache.validators(entry)
+
+        for attempt in range(self.max_attempts):
+            result = self.attempt(url, attempt, headers)
+            if isinstance(result, requests.Response):
+                return self.cache.update(url, entry, result) if self.cache is not None else result
+            self.sleep(result)
+
+    # То же для асинхронного обхода: каждая попытка проходит через ограничение частоты,
+    # а ожидание перед повтором не занимает поток
+    async def fetch_async(self, url: str, limiter: RateLimiter | None = None) -> requests.Response:
+
+        entry = None
+        if self.cache is not None:
+            cached, entry = await asyncio.to_thread(self.cache.get, url)
+            if cached is not None:
+                return cached
+
+        headers = ResponseCache.validators(entry)
+
+        for attempt in range(self.max_attempts):
+            if limiter is not None:
+                await limiter.wait()
+            result = await asyncio.to_thread(self.attempt, url, attempt, headers)
+            if isinstance(result, requests.Response):
+                if self.cache is not None:
+                    return await asyncio.to_thread(self.cache.update, url, entry, result)
+                return result
+            await asyncio.sleep(result)
+
+
+# Контрольная точка обхода: ссылка на следующую страницу, номер страницы и подсчитанные буквы.
+# Файл перезаписывается атомарно, поэтому после падения в нём всегда целое состояние
+def save_checkpoint(checkpoint_path: str, next_page: str | None, beasts_dict: dict[str, int], page: int) -> None:
+
+    directory = os.path.dirname(os.path.abspath(checkpoint_path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump({'next_page': next_page, 'page': page, 'beasts': beasts_dict}, file, ensure_ascii=False)
+        os.replace(temporary_path, checkpoint_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def load_checkpoint(checkpoint_path: str) -> tuple[str | None, dict[str, int], int] | None:
+
+    try:
+        with open(checkpoint_path, encoding='utf-8') as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return None
+
+    return checkpoint['next_page'], checkpoint['beasts'], checkpoint['page']
+
+
+# checkpoint_path - файл контрольной точки: если он есть, обход продолжается с сохранённой страницы,
+# после каждой страницы он обновляется, а после записи результата удаляется.
+# extractor - способ разбора страниц из EXTRACTORS
+def scrape_animals(wiki_address: str = WIKI_ADDRESS, output_path: str = 'beasts.csv', verbose: bool = True,
+                   fetcher: Fetcher | None = None, checkpoint_path: str | None = None, extractor: str = 'stream'):
+
+    # Загрузчик, созданный здесь, здесь же и закрывается; переданный остаётся открытым
+    if fetcher is None:
+        with Fetcher() as fetcher:
+            return scrape_animals(wiki_address, output_path, verbose, fetcher, checkpoint_path, extractor)
+
+    next_page = START_PAGE
+
+    beasts_dict = {}
+
+    i = 1
+
+    checkpoint = load_checkpoint(checkpoint_path) if checkpoint_path is not None else None
+    if checkpoint is not None:
+        next_page, beasts_dict, i = checkpoint
+        if verbose:
+            print(f'Обход продолжается со страницы № {i}')
+
+    while next_page is not None:
+
+        # Страница с ошибкой до подсчёта не доходит: Fetcher либо повторит запрос, либо выбросит исключение
+        r = fetcher.fetch(wiki_address + next_page)
+
+        current_page_beasts, next_page = extract_page(r.text, extractor)
+        if verbose:
+            print(f'Звери со страницы № {i}: {current_page_beasts}')
+
+        count_beasts(current_page_beasts, beasts_dict)
+
+        if next_page is not None:
+            i += 1
+
+        if checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, next_page, beasts_dict, i)
+
+    write_beasts(beasts_dict, output_path)
+    if checkpoint_path is not None:
+        os.remove(checkpoint_path)
+    if verbose:
+        print(f'Звери подсчитаны на {i} страницах и записаны в файл {output_path}')
+        print(f'Статистика запросов: {fetcher.stats}')
+        if fetcher.cache is not None:
+            print(f'Кэш страниц: {fetcher.cache}')
+
+    return beasts_dict
+
+
+# Обход одной цепочки страниц категории по ссылкам «Следующая страница». Ссылка на следующую
+# страницу находится регулярным выражением сразу после загрузки, а полный разбор страницы
+# выполняется в отдельном потоке одновременно со скачиванием следующей страницы
+async def crawl_chain(fetcher: Fetcher, wiki_address: str, next_page: str | None,
+                      semaphore: asyncio.Semaphore, limiter: RateLimiter, parse_tasks: list,
+                      extractor: str = 'stream') -> int:
+
+    pages = 0
+
+    while next_page is not None:
+
+        async with semaphore:
+            response = await fetcher.fetch_async(wiki_address + next_page, limiter)
+
+        text = response.text
+
+        next_page = find_next_page(text)
+
+        parse_tasks.append(asyncio.create_task(asyncio.to_thread(parse_beasts, text, extractor)))
+        pages += 1
+
+    return pages
+
+
+# Асинхронный обход категории: start_pages - начала цепочек страниц, которые обходятся параллельно,
+# concurrency - сколько запросов может выполняться одновременно, rate - сколько запросов в секунду
+# разрешено отправлять (None - без ограничения), fetcher - загрузчик с настройками повторов
+# (по умолчанию с пулом соединений на concurrency запросов), extractor - способ разбора страниц
+# из EXTRACTORS. Возвращает словарь букв и число страниц
+async def crawl_animals_async(wiki_address: str = WIKI_ADDRESS, start_pages: tuple[str, ...] = (START_PAGE,),
+                              concurrency: int = 4, rate: float | None = None,
+                              fetcher: Fetcher | None = None, extractor: str = 'stream') -> tuple[dict[str, int], int]:
+
+    if extractor not in EXTRACTORS:
+        raise ValueError(f'Неизвестный способ разбора: {extractor!r}, допустимые: {", ".join(EXTRACTORS)}')
+
+    if concurrency < 1:
+        raise ValueError('Число одновременных запросов должно быть положительным')
+
+    if fetcher is None:
+        with Fetcher(create_session(concurrency)) as fetcher:
+            return await crawl_animals_async(wiki_address, start_pages, concurrency, rate, fetcher, extractor)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    parse_tasks = []
+
+    try:
+        pages = await asyncio.gather(*(
+            crawl_chain(fetcher, wiki_address, start_page, semaphore, limiter, parse_tasks, extractor)
+            for start_page in start_pages
+        ))
+    except BaseException:
+        for task in parse_tasks:
+            task.cancel()
+        raise
+
+    # Буквы добавляются в порядке страниц, как при последовательном обходе
+    beasts_dict = {}
+    for task in parse_tasks:
+        count_beasts(await task, beasts_dict)
+
+    return beasts_dict, sum(pages)
+
+
+# Начала участков для обхода по буквам: первый участок начинается с начала категории,
+# остальные - с параметра from= у равномерно выбранных букв из letters
+def shard_pages(shards: int, letters: str = SHARD_LETTERS) -> list[str]:
+
+    if shards < 1:
+        raise ValueError('Число участков должно быть положительным')
+
+    shards = min(shards, len(letters))
+
+    return [START_PAGE] + [
+        f'{START_PAGE}?from={quote(letters[shard * len(letters) // shards])}' for shard in range(1, shards)
+    ]
+
+
+# Сложение словарей букв участков в порядке участков, то есть в порядке страниц категории
+def merge_counts(shard_counts: list[dict[str, int]]) -> dict[str, int]:
+
+    beasts_dict = {}
+    for counts in shard_counts:
+        for letter, count in counts.items():
+            beasts_dict[letter] = beasts_dict.get(letter, 0) + count
+
+    return beasts_dict
+
+
+async def fetch_page(fetcher: Fetcher, url: str, semaphore: asyncio.Semaphore, limiter: RateLimiter,
+                     extractor: str) -> tuple[list[str], str | None]:
+
+    async with semaphore:
+        response = await fetcher.fetch_async(url, limiter)
+
+    return await asyncio.to_thread(extract_page, response.text, extractor)
+
+
+# Обход одного участка: звери считаются с первой страницы участка до первого зверя, с которого
+# начинается другой участок (stop_names). Возвращает буквы участка, число страниц и зверя,
+# на котором участок остановился (None, если участок дошёл до конца категории)
+async def crawl_shard(fetcher: Fetcher, wiki_address: str, first_page: tuple[list[str], str | None],
+                      stop_names: set[str], semaphore: asyncio.Semaphore, limiter: RateLimiter,
+                      extractor: str) -> tuple[dict[str, int], int, str | None]:
+
+    beasts, next_page = first_page
+    beasts_dict = {}
+    pages = 1
+
+    while True:
+
+        for index, beast in enumerate(beasts):
+            if beast in stop_names:
+                count_beasts(beasts[:index], beasts_dict)
+                return beasts_dict, pages, beast
+
+        count_beasts(beasts, beasts_dict)
+
+        if next_page is None:
+            return beasts_dict, pages, None
+
+        beasts, next_page = await fetch_page(fetcher, wiki_address + next_page, semaphore, limiter, extractor)
+        pages += 1
+
+
+# Обход по буквам: категория делится на shards участков, которые начинаются с from=<буква> и обходятся
+# параллельно. Сначала загружаются первые страницы всех участков: первый зверь каждой из них - граница,
+# на которой останавливается любой другой участок, дошедший до неё, поэтому каждый зверь считается ровно
+# одним участком при любом разбиении страниц и даже если порядок букв в категории отличается от letters.
+# Участки, совпавшие с другими или пустые (буквы нет в категории), отбрасываются. Словари участков
+# складываются в порядке категории: от первого участка к тому, на границе которого он остановился, и т.д.
+# Остальные параметры - как у crawl_animals_async. Возвращает словарь букв и число страниц
+async def crawl_sharded_async(wiki_address: str = WIKI_ADDRESS, shards: int = 8, letters: str = SHARD_LETTERS,
+                              concurrency: int = 8, rate: float | None = None, fetcher: Fetcher | None = None,
+                              extractor: str = 'stream') -> tuple[dict[str, int], int]:
+
+    if extractor not in EXTRACTORS:
+        raise ValueError(f'Неизвестный способ разбора: {extractor!r}, допустимые: {", ".join(EXTRACTORS)}')
+
+    if concurrency < 1:
+        raise ValueError('Число одновременных запросов должно быть положительным')
+
+    if fetcher is None:
+        with Fetcher(create_session(concurrency)) as fetcher:
+            return await crawl_sharded_async(wiki_address, shards, letters, concurrency, rate, fetcher, extractor)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+
+    seeds = shard_pages(shards, letters)
+    first_pages = await asyncio.gather(*(
+        fetch_page(fetcher, wiki_address + seed, semaphore, limiter, extractor) for seed in seeds
+    ))
+
+    # Первый участок оставляем всегда: он начинается с начала категории
+    kept = [first_pages[0]]
+    starts = {first_pages[0][0][0]} if first_pages[0][0] else set()
+    for beasts, next_page in first_pages[1:]:
+        if beasts and beasts[0] not in starts:
+            starts.add(beasts[0])
+            kept.append((beasts, next_page))
+
+    results = await asyncio.gather(*(
+        crawl_shard(fetcher, wiki_address, first_page, starts - {first_page[0][0]} if first_page[0] else starts,
+                    semaphore, limiter, extractor)
+        for first_page in kept
+    ))
+
+    pages = sum(shard_pages_count for _, shard_pages_count, _ in results) + len(seeds) - len(kept)
+
+    # Порядок участков в категории восстанавливается по границам, на которых они остановились
+    shards_by_start = {beasts[0]: result for (beasts, _), result in zip(kept[1:], results[1:])}
+    ordered = [results[0]]
+    while ordered[-1][2] is not None:
+        ordered.append(shards_by_start.pop(ordered[-1][2]))
+    if shards_by_start:
+        raise RuntimeError('Участки не сложились в одну цепочку: категория изменилась во время обхода')
+
+    return merge_counts([counts for counts, _, _ in ordered]), pages
+
+
+# shards > 1 включает обход по буквам (crawl_sharded_async)
+def crawl_animals(wiki_address: str = WIKI_ADDRESS, output_path: str = 'beasts.csv',
+                  concurrency: int = 4, rate: float | None = None, verbose: bool = True,
+                  fetcher: Fetcher | None = None, extractor: str = 'stream', shards: int = 1) -> dict[str, int]:
+
+    if fetcher is None:
+        with Fetcher(create_session(concurrency)) as fetcher:
+            return crawl_animals(wiki_address, output_path, concurrency, rate, verbose, fetcher, extractor, shards)
+
+    if shards > 1:
+        crawl = crawl_sharded_async(wiki_address, shards, concurrency=concurrency, rate=rate,
+                                    fetcher=fetcher, extractor=extractor)
+    else:
+        crawl = crawl_animals_async(wiki_address, concurrency=concurrency, rate=rate,
+                                    fetcher=fetcher, extractor=extractor)
+    beasts_dict, pages = asyncio.run(crawl)
+
+    write_beasts(beasts_dict, output_path)
+    if verbose:
+        print(f'Звери подсчитаны на {pages} страницах и записаны в файл {output_path}')
+        print(f'Статистика запросов: {fetcher.stats}')
+        if fetcher.cache is not None:
+            print(f'Кэш страниц: {fetcher.cache}')
+
+    return beasts_dict
+
+
+# Локальная замена категории Википедии для тестов и замеров: страницы по page_size зверей,
+# зверей на каждую букву столько, сколько указано в counts, буквы идут в порядке counts.
+# Поддерживает параметры pagefrom=<зверь> (ссылка «Следующая страница») и from=<буква>
+# (страница с первого зверя на эту букву, пустая страница, если такой буквы нет).
+# latency - задержка ответа в секундах, имитирующая сеть. faults - ответы для очередных запросов:
+# код ошибки, пара (код ошибки, Retry-After) или None для обычной страницы; ошибка отдаётся
+# вместе с содержимым страницы, чтобы было видно, если её по ошибке посчитают.
+# Страницы отдаются с ETag и Last-Modified, на условные запросы сервер отвечает 304,
+# touch() имитирует правку категории: меняет все страницы и время их изменения
+class FixtureCategoryServer:
+
+    def __init__(self, counts: dict[str, int], page_size: int = 200, latency: float = 0.0, faults=()):
+
+        self.page_size = page_size
+        self.latency = latency
+        self.faults = deque(faults)
+        self.names = [f'{letter}{index:05d}' for letter, count in counts.items() for index in range(count)]
+        self.name_indexes = {name: index for index, name in enumerate(self.names)}
+
+        # Позиция первого зверя на каждую букву для параметра from=
+        self.letter_indexes = {}
+        for index, name in enumerate(self.names):
+            self.letter_indexes.setdefault(name[0], index)
+
+        self.revision = 0
+        self.modified = int(time.time())
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                fixture.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        # Короткий интервал опроса, чтобы остановка сервера в тестах не ждала по полсекунды
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def address(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self) -> 'FixtureCategoryServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def touch(self) -> None:
+        self.revision += 1
+        self.modified += 1
+
+    # Номер первого зверя страницы по параметрам запроса
+    def page_start(self, query: dict[str, list[str]]) -> int:
+
+        if 'pagefrom' in query:
+            return self.name_indexes.get(query['pagefrom'][0], len(self.names))
+
+        if 'from' in query:
+            return self.letter_indexes.get(query['from'][0], len(self.names))
+
+        return 0
+
+    def render_page(self, start: int) -> str:
+
+        names = self.names[start: start + self.page_size]
+        end = start + len(names)
+
+        if end < len(self.names):
+            href = f'/w/index.php?title={quote(START_PAGE[6:])}&amp;pagefrom={quote(self.names[end])}#mw-pages'
+            next_link = f'(<a href="{href}" title="Категория:Животные по алфавиту">Следующая страница</a>)'
+        else:
+            next_link = '(Следующая страница)'
+
+        groups = []
+        for name in names:
+            if not groups or groups[-1][0] != name[0]:
+                groups.append((name[0], []))
+            groups[-1][1].append(f'<li><a href="/wiki/{quote(name)}" title="{name}">{name}</a></li>')
+
+        columns = ''.join(
+            f'<div class="mw-category-group"><h3>{letter}</h3>\n<ul>{"".join(items)}</ul></div>'
+            for letter, items in groups
+        )
+
+        return (
+            '<!DOCTYPE html>\n<html lang="ru"><head><meta charset="UTF-8">'
+            f'<title>Категория:Животные по алфавиту — Википедия</title></head><body><!-- revision {self.revision} -->'
+            '<div id="mw-pages"><h2>Страницы в категории «Животные по алфавиту»</h2>'
+            f'{next_link}<div lang="ru" dir="ltr" class="mw-content-ltr">'
+            f'<div class="mw-category mw-category-columns">{columns}</div></div>{next_link}'
+            '</div></body></html>'
+        )
+
+    # If-None-Match важнее If-Modified-Since, как требует RFC 9110
+    def is_not_modified(self, request: BaseHTTPRequestHandler, etag: str) -> bool:
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in (tag.strip() for tag in if_none_match.split(','))
+
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.modified
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fault = self.faults.popleft() if self.faults else None
+
+        status, retry_after = fault if isinstance(fault, tuple) else (fault or 200, None)
+
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+
+            body = self.render_page(self.page_start(parse_qs(urlsplit(request.path).query))).encode('utf-8')
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            last_modified = formatdate(self.modified, usegmt=True)
+
+            if status == 200 and self.is_not_modified(request, etag):
+                with self.lock:
+                    self.not_modified += 1
+                request.send_response(304)
+                request.send_header('ETag', etag)
+                request.end_headers()
+                return
+
+            request.send_response(status)
+            if retry_after is not None:
+                request.send_header('Retry-After', str(retry_after))
+            if status == 200:
+                request.send_header('ETag', etag)
+                request.send_header('Last-Modified', last_modified)
+            request.send_header('Content-Type', 'text/html; charset=UTF-8')
+            request.send_header('Content-Length', str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент не дождался ответа и оборвал соединение по таймауту
+            pass
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class CrawlerTestCase(unittest.TestCase):
+    """Общая основа тестов обхода: число зверей на каждую букву и временный каталог для результатов"""
+
+    counts = {'А': 4, 'Б': 2, 'R': 3}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.output_path = os.path.join(self.directory, 'beasts.csv')
+
+
+class TestCrawler(CrawlerTestCase):
+    """Тесты обхода категории на локальном сервере с тестовыми страницами"""
+
+    counts = {'А': 7, 'Б': 3, 'R': 5, 'Ё': 1, 'Z': 4}
+
+    def read_output(self) -> dict[str, int]:
+        with open(self.output_path, encoding='utf-8', newline='') as file:
+            return {letter: int(count) for letter, count in csv.reader(file)}
+
+    def test_sequential_scrape(self):
+        """Тест: последовательный обход считает зверей на каждую букву."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            scrape_animals(server.address, self.output_path, verbose=False)
+            self.assertEqual(server.requests, 7)
+        self.assertEqual(self.read_output(), self.counts)
+
+    def test_async_crawl(self):
+        """Тест: асинхронный обход даёт тот же результат и тот же порядок букв."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            beasts_dict = crawl_animals(server.address, self.output_path, concurrency=3, verbose=False)
+            self.assertEqual(server.requests, 7)
+        self.assertEqual(list(beasts_dict.items()), list(self.counts.items()))
+        self.assertEqual(self.read_output(), self.counts)
+
+    def test_concurrency_limit(self):
+        """Тест: одновременно выполняется не больше concurrency запросов."""
+        with FixtureCategoryServer(self.counts, page_size=2, latency=0.02) as server:
+            start_pages = tuple(f'{START_PAGE}?from={quote(letter)}' for letter in self.counts)
+            _, pages = asyncio.run(crawl_animals_async(server.address, start_pages, concurrency=2))
+            self.assertLessEqual(server.max_in_flight, 2)
+            self.assertEqual(pages, server.requests)
+
+    def test_rate_limit(self):
+        """Тест: запросы отправляются не чаще rate в секунду."""
+        with FixtureCategoryServer(self.counts, page_size=5) as server:
+            started = time.monotonic()
+            _, pages = asyncio.run(crawl_animals_async(server.address, concurrency=4, rate=20))
+            self.assertGreaterEqual(time.monotonic() - started, (pages - 1) / 20)
+
+
+class TestExtractors(unittest.TestCase):
+    """Тесты разбора страниц категории"""
+
+    def setUp(self):
+        self.server = FixtureCategoryServer({'А': 3, 'Б': 4, 'Ё': 2}, page_size=4)
+
+    def test_extractors_agree(self):
+        """Тест: потоковый разбор и BeautifulSoup находят одно и то же на каждой странице."""
+        for start in range(0, len(self.server.names), 4):
+            text = self.server.render_page(start)
+            with self.subTest(start=start):
+                self.assertEqual(extract_page_stream(text), extract_page_soup(text))
+
+    def test_page_content(self):
+        """Тест: извлекаются звери из списка и адрес следующей страницы без HTML-сущностей."""
+        beasts, next_page = extract_page(self.server.render_page(0))
+        self.assertEqual(beasts, ['А00000', 'А00001', 'А00002', 'Б00000'])
+        self.assertTrue(next_page.startswith('/w/index.php?title='))
+        self.assertIn('&pagefrom=%D0%9100001', next_page)
+        self.assertEqual(extract_page(self.server.render_page(8)), (['Ё00001'], None))
+
+    def test_links_outside_category_are_ignored(self):
+        """Тест: ссылки вне списков категории и вложенная разметка не мешают разбору."""
+        text = (
+            '<html><body><div id="content"><a href="/wiki/Заглавная">Заглавная</a>'
+            '<div id="mw-pages"><a href="/next?a=1&amp;b=2">Следующая страница</a>'
+            '<div class="mw-category mw-category-columns"><div class="mw-category-group"><h3>К</h3>'
+            '<ul><li><a href="/wiki/1"><i>Кот</i> лесной</a></li><li><a href="/wiki/2">Кит</a></li></ul>'
+            '</div></div><a href="/next?a=1&amp;b=2">Следующая страница</a></div>'
+            '<ul><li><a href="/wiki/Служебная">Служебная</a></li></ul></div></body></html>'
+        )
+        expected = (['Кот лесной', 'Кит'], '/next?a=1&b=2')
+        self.assertEqual(extract_page(text, 'stream'), expected)
+        self.assertEqual(extract_page(text, 'soup'), expected)
+
+    def test_subcategories_and_files_are_ignored(self):
+        """Тест: списки и ссылки «Следующая страница» блоков подкатегорий и файлов не попадают в разбор."""
+        subcategories = (
+            '<div id="mw-subcategories"><h2>Подкатегории</h2>'
+            '(<a href="/w/index.php?subcatfrom=Б">Следующая страница</a>)'
+            '<div lang="ru" dir="ltr" class="mw-content-ltr"><div class="mw-category mw-category-columns">'
+            '<div class="mw-category-group"><h3>П</h3><ul><li><a href="/wiki/Категория:Птицы">Птицы</a></li>'
+            '<li><a href="/wiki/Категория:Рыбы">Рыбы</a></li></ul></div></div></div></div>'
+        )
+        files = (
+            '<div id="mw-category-media"><h2>Файлы</h2>'
+            '(<a href="/w/index.php?filefrom=Б">Следующая страница</a>)'
+            '<div class="mw-category mw-category-columns"><ul><li><a href="/wiki/Файл:Кот.jpg">Кот.jpg</a></li></ul>'
+            '</div></div>'
+        )
+        for start, expected in ((0, extract_page(self.server.render_page(0))), (8, (['Ё00001'], None))):
+            page = self.server.render_page(start).replace('<div id="mw-pages">', subcategories + '<div id="mw-pages">')
+            page = page.replace('</body>', files + '</body>')
+            with self.subTest(start=start):
+                self.assertEqual(extract_page_stream(page), expected)
+                self.assertEqual(extract_page_soup(page), expected)
+                self.assertEqual(find_next_page(page), expected[1])
+
+    def test_unknown_extractor(self):
+        """Тест: неизвестный способ разбора отклоняется."""
+        with self.assertRaises(ValueError):
+            extract_page('', 'lxml')
+
+    def test_crawl_with_each_extractor(self):
+        """Тест: обход даёт одинаковый результат с любым способом разбора."""
+        with tempfile.TemporaryDirectory() as directory, self.server as server:
+            output_path = os.path.join(directory, 'beasts.csv')
+            for extractor in EXTRACTORS:
+                with self.subTest(extractor=extractor):
+                    self.assertEqual(
+                        scrape_animals(server.address, output_path, verbose=False, extractor=extractor),
+                        {'А': 3, 'Б': 4, 'Ё': 2},
+                    )
+                    beasts_dict, _ = asyncio.run(crawl_animals_async(server.address, extractor=extractor))
+                    self.assertEqual(beasts_dict, {'А': 3, 'Б': 4, 'Ё': 2})
+
+
+class TestShardedCrawl(unittest.TestCase):
+    """Тесты обхода по буквам"""
+
+    counts = {'А': 5, 'Б': 3, 'В': 1, 'Г': 7, 'Д': 2, 'A': 4, 'B': 6}
+
+    def crawl(self, page_size: int, shards: int, letters: str = 'АБВГДAB', **kwargs) -> tuple[dict, int, int]:
+        with FixtureCategoryServer(self.counts, page_size=page_size, **kwargs) as server:
+            beasts_dict, pages = asyncio.run(crawl_sharded_async(server.address, shards, letters, concurrency=4))
+            return beasts_dict, pages, server.requests
+
+    def test_matches_single_chain(self):
+        """Тест: при любом разбиении страниц и числе участков результат совпадает с обходом одной цепочки."""
+        for page_size in (1, 2, 3, 5, 100):
+            for shards in (1, 2, 3, 7, 20):
+                with self.subTest(page_size=page_size, shards=shards):
+                    beasts_dict, pages, requests_count = self.crawl(page_size, shards)
+                    self.assertEqual(list(beasts_dict.items()), list(self.counts.items()))
+                    self.assertEqual(pages, requests_count)
+
+    def test_letters_out_of_category_order(self):
+        """Тест: участки считаются верно, даже если буквы в letters идут не в порядке категории."""
+        for page_size in (1, 3, 100):
+            with self.subTest(page_size=page_size):
+                beasts_dict, pages, requests_count = self.crawl(page_size, shards=7, letters='BДАГAВБ')
+                self.assertEqual(list(beasts_dict.items()), list(self.counts.items()))
+                self.assertEqual(pages, requests_count)
+
+    def test_missing_letters_are_skipped(self):
+        """Тест: участки с буквами, которых нет в категории, пустые и не мешают подсчёту."""
+        beasts_dict, _, _ = self.crawl(page_size=2, shards=9, letters='АЁБЖВГДAB')
+        self.assertEqual(beasts_dict, self.counts)
+
+    def test_shard_pages(self):
+        """Тест: начала участков равномерно распределены по буквам."""
+        self.assertEqual(shard_pages(1), [START_PAGE])
+        self.assertEqual(shard_pages(3, 'АБВГДЕ'), [START_PAGE, f'{START_PAGE}?from=%D0%92', f'{START_PAGE}?from=%D0%94'])
+        self.assertEqual(len(shard_pages(100, 'АБВ')), 3)
+
+    def test_merge_counts(self):
+        """Тест: словари участков складываются без потерь в порядке участков."""
+        self.assertEqual(list(merge_counts([{'А': 2, 'Б': 1}, {'Б': 3, 'В': 1}, {}]).items()),
+                         [('А', 2), ('Б', 4), ('В', 1)])
+
+    def test_retries_in_shards(self):
+        """Тест: повторы запросов в участках не приводят к двойному подсчёту."""
+        beasts_dict, pages, requests_count = self.crawl(page_size=2, shards=4, faults=[503, None, 429, 503])
+        self.assertEqual(beasts_dict, self.counts)
+        self.assertEqual(requests_count, pages + 3)
+
+    def test_crawl_animals_writes_merged_counts(self):
+        """Тест: обход по буквам записывает в CSV то же, что и обход одной цепочки."""
+        # Участки начинаются с букв А, Н, Ю и M из SHARD_LETTERS
+        counts = {'А': 4, 'Н': 3, 'Ю': 2, 'Я': 1, 'A': 3, 'M': 2, 'Z': 2}
+        with tempfile.TemporaryDirectory() as directory, FixtureCategoryServer(counts, page_size=3) as server:
+            output_path = os.path.join(directory, 'beasts.csv')
+            crawl_animals(server.address, output_path, shards=4, verbose=False)
+            self.assertEqual(server.requests, 9)
+            with open(output_path, encoding='utf-8', newline='') as file:
+                self.assertEqual(list(csv.reader(file)), [[letter, str(count)] for letter, count in counts.items()])
+
+
+class TestFetcher(CrawlerTestCase):
+    """Тесты повторов запросов на сервере, который отвечает 429 и 503"""
+
+    def setUp(self):
+        super().setUp()
+        self.delays = []
+
+    def test_retried_pages_are_not_counted(self):
+        """Тест: ответы 429 и 503 повторяются и не попадают в подсчёт."""
+        faults = [429, None, 503, 503, None]
+        with FixtureCategoryServer(self.counts, page_size=3, faults=faults) as server:
+            fetcher = Fetcher(sleep=self.delays.append)
+            beasts_dict = scrape_animals(server.address, self.output_path, verbose=False, fetcher=fetcher)
+        self.assertEqual(beasts_dict, self.counts)
+        self.assertEqual((fetcher.stats.requests, fetcher.stats.retries), (6, 3))
+        self.assertEqual(len(self.delays), 3)
+
+    def test_async_crawl_retries(self):
+        """Тест: асинхронный обход тоже повторяет ответы с ошибкой и не считает их."""
+        faults = [503, (429, 0), None, 503]
+        with FixtureCategoryServer(self.counts, page_size=3, faults=faults) as server:
+            fetcher = Fetcher(create_session(2), backoff=0.001)
+            beasts_dict, pages = asyncio.run(crawl_animals_async(server.address, concurrency=2, fetcher=fetcher))
+        self.assertEqual(beasts_dict, self.counts)
+        self.assertEqual((pages, fetcher.stats.requests, fetcher.stats.retries), (3, 6, 3))
+
+    def test_retry_after(self):
+        """Тест: задержка из Retry-After важнее экспоненциальной."""
+        with FixtureCategoryServer(self.counts, page_size=10, faults=[(429, 7), (503, 2)]) as server:
+            fetcher = Fetcher(sleep=self.delays.append)
+            scrape_animals(server.address, self.output_path, verbose=False, fetcher=fetcher)
+        self.assertEqual(self.delays, [7.0, 2.0])
+
+    def test_retry_after_date(self):
+        """Тест: Retry-After в виде даты переводится в секунды ожидания."""
+        response = requests.Response()
+        response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(Fetcher().retry_delay(0, response), 0.0)
+
+    def test_exponential_backoff(self):
+        """Тест: задержка растёт экспоненциально со случайным разбросом и ограничена сверху."""
+        fetcher = Fetcher(backoff=0.5, max_backoff=4)
+        random.seed(0)
+        for attempt, limit in enumerate([0.5, 1, 2, 4, 4, 4]):
+            delays = [fetcher.retry_delay(attempt) for _ in range(50)]
+            self.assertTrue(all(0 <= delay <= limit for delay in delays))
+            self.assertGreater(max(delays), limit / 2)
+
+    def test_max_attempts(self):
+        """Тест: после max_attempts неудачных попыток выбрасывается ошибка."""
+        with FixtureCategoryServer(self.counts, faults=[503] * 10) as server:
+            fetcher = Fetcher(max_attempts=3, sleep=self.delays.append)
+            with self.assertRaises(requests.HTTPError):
+                scrape_animals(server.address, self.output_path, verbose=False, fetcher=fetcher)
+            self.assertEqual(server.requests, 3)
+        self.assertEqual((fetcher.stats.requests, fetcher.stats.retries), (3, 2))
+        self.assertFalse(os.path.exists(self.output_path))
+
+    def test_client_error_is_not_retried(self):
+        """Тест: ошибка клиента не повторяется."""
+        with FixtureCategoryServer(self.counts, faults=[404]) as server:
+            fetcher = Fetcher(sleep=self.delays.append)
+            with self.assertRaises(requests.HTTPError):
+                scrape_animals(server.address, self.output_path, verbose=False, fetcher=fetcher)
+        self.assertEqual((fetcher.stats.requests, fetcher.stats.retries), (1, 0))
+
+    def test_timeout(self):
+        """Тест: медленный ответ обрывается по таймауту и повторяется."""
+        with FixtureCategoryServer(self.counts, latency=0.5) as server:
+            fetcher = Fetcher(max_attempts=2, timeout=0.05, sleep=self.delays.append)
+            with self.assertRaises(requests.Timeout):
+                fetcher.fetch(server.address + START_PAGE)
+        self.assertEqual((fetcher.stats.requests, fetcher.stats.errors, fetcher.stats.retries), (2, 2, 1))
+        self.assertLess(fetcher.stats.max_latency, 0.5)
+
+    def test_stats_from_threads(self):
+        """Тест: счётчики не теряют обновлений из нескольких потоков."""
+        stats = FetchStats()
+        cache = ResponseCache(self.directory)
+        cache.save({'url': 'адрес', 'etag': None, 'last_modified': None, 'stored_at': time.time(), 'text': ''})
+
+        def update():
+            for index in range(10_000):
+                stats.record(0.001, error=True)
+                stats.record_retry()
+                if index % 10 == 0:
+                    cache.get('адрес')
+
+        threads = [threading.Thread(target=update) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((stats.requests, stats.errors, stats.retries, cache.hits), (40_000, 40_000, 40_000, 4_000))
+
+    def test_only_created_sessions_are_closed(self):
+        """Тест: обход закрывает только загрузчик, который создал сам, переданный остаётся открытым."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server, \
+                mock.patch.object(Fetcher, 'close', autospec=True) as close:
+            fetcher = Fetcher()
+            scrape_animals(server.address, self.output_path, verbose=False, fetcher=fetcher)
+            crawl_animals(server.address, self.output_path, verbose=False, fetcher=fetcher)
+            crawl_animals(server.address, self.output_path, verbose=False, fetcher=fetcher, shards=2)
+            asyncio.run(crawl_animals_async(server.address, fetcher=fetcher))
+            self.assertEqual(close.call_count, 0)
+
+            scrape_animals(server.address, self.output_path, verbose=False)
+            crawl_animals(server.address, self.output_path, verbose=False)
+            asyncio.run(crawl_animals_async(server.address))
+            asyncio.run(crawl_sharded_async(server.address, shards=2))
+            self.assertEqual(close.call_count, 4)
+            self.assertNotIn(fetcher, [call.args[0] for call in close.call_args_list])
+        fetcher.close()
+
+
+class TestCheckpoint(CrawlerTestCase):
+    """Тесты продолжения обхода с контрольной точки"""
+
+    def setUp(self):
+        super().setUp()
+        self.checkpoint_path = os.path.join(self.directory, 'checkpoint.json')
+
+    def test_resume_after_failure(self):
+        """Тест: после падения обход продолжается с первой не подсчитанной страницы."""
+        with FixtureCategoryServer(self.counts, page_size=2, faults=[None, None, 404]) as server:
+            with self.assertRaises(requests.HTTPError):
+                scrape_animals(server.address, self.output_path, verbose=False, checkpoint_path=self.checkpoint_path)
+
+            next_page, beasts_dict, page = load_checkpoint(self.checkpoint_path)
+            self.assertEqual((beasts_dict, page), ({'А': 4}, 3))
+            self.assertIn('pagefrom=%D0%9100000', next_page)
+
+            beasts_dict = scrape_animals(server.address, self.output_path, verbose=False,
+                                         checkpoint_path=self.checkpoint_path)
+            self.assertEqual(server.requests, 3 + 3)
+
+        self.assertEqual(list(beasts_dict.items()), list(self.counts.items()))
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_checkpoint_is_replaced_atomically(self):
+        """Тест: при ошибке записи старая контрольная точка остаётся целой."""
+        save_checkpoint(self.checkpoint_path, '/next', {'А': 1}, 2)
+        with mock.patch('json.dump', side_effect=OSError('диск заполнен')):
+            with self.assertRaises(OSError):
+                save_checkpoint(self.checkpoint_path, '/after', {'А': 2}, 3)
+        self.assertEqual(load_checkpoint(self.checkpoint_path), ('/next', {'А': 1}, 2))
+        self.assertEqual(os.listdir(os.path.dirname(self.checkpoint_path)), ['checkpoint.json'])
+
+
+class TestResponseCache(CrawlerTestCase):
+    """Тесты кэша страниц с проверкой изменений по ETag и Last-Modified"""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_directory = os.path.join(self.directory, 'cache')
+        self.now = 1_000_000.0
+
+    def scrape(self, server: FixtureCategoryServer, ttl: float = 3600) -> ResponseCache:
+        cache = ResponseCache(self.cache_directory, ttl=ttl, clock=lambda: self.now)
+        beasts_dict = scrape_animals(server.address, self.output_path, verbose=False, fetcher=Fetcher(cache=cache))
+        self.assertEqual(beasts_dict, self.counts)
+        return cache
+
+    def test_fresh_pages_are_not_requested(self):
+        """Тест: в пределах ttl страницы берутся из кэша без запросов."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            cache = self.scrape(server)
+            self.assertEqual((cache.hits, cache.revalidated, cache.misses), (0, 0, 3))
+            cache = self.scrape(server)
+            self.assertEqual((cache.hits, cache.revalidated, cache.misses), (3, 0, 0))
+            self.assertEqual(server.requests, 3)
+
+    def test_stale_pages_are_revalidated(self):
+        """Тест: после ttl сервер подтверждает, что страницы не изменились, и они не скачиваются заново."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            self.scrape(server)
+            self.now += 7200
+            cache = self.scrape(server)
+            self.assertEqual((cache.hits, cache.revalidated, cache.misses), (0, 3, 0))
+            self.assertEqual(server.not_modified, 3)
+
+            # Проверка продлила записи
+            cache = self.scrape(server)
+            self.assertEqual(cache.hits, 3)
+
+    def test_changed_pages_are_downloaded(self):
+        """Тест: изменившиеся страницы скачиваются заново."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            self.scrape(server)
+            server.touch()
+            self.now += 7200
+            cache = self.scrape(server)
+            self.assertEqual((cache.hits, cache.revalidated, cache.misses), (0, 0, 3))
+
+    def test_last_modified_without_etag(self):
+        """Тест: без ETag изменения проверяются по Last-Modified."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            cache = self.scrape(server)
+            url = server.address + START_PAGE
+            entry = cache.lookup(url)
+            del entry['etag']
+            entry['stored_at'] = 0
+            cache.save(entry)
+
+            fetcher = Fetcher(cache=cache)
+            self.assertEqual(fetcher.fetch(url).text, entry['text'])
+            self.assertEqual(server.not_modified, 1)
+
+    def test_async_crawl_uses_cache(self):
+        """Тест: асинхронный обход тоже берёт страницы из кэша."""
+        with FixtureCategoryServer(self.counts, page_size=3) as server:
+            self.scrape(server)
+            cache = ResponseCache(self.cache_directory, clock=lambda: self.now)
+            beasts_dict, _ = asyncio.run(crawl_animals_async(server.address, fetcher=Fetcher(cache=cache)))
+            self.assertEqual(beasts_dict, self.counts)
+            self.assertEqual((cache.hits, server.requests), (3, 3))
 
 
 if __name__ == '__main__':
-    scrape_animals()
\ No newline at end of file
+    with Fetcher(cache=ResponseCache('.cache')) as fetcher:
+        scrape_animals(fetcher=fetcher, checkpoint_path='beasts.checkpoint.json')
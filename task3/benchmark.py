@@ -0,0 +1,404 @@
+from contextlib import contextmanager
+from functools import partial
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from solution import (AppearanceTracker, GroupAppearance, IntervalSet, MergedIntervalsCache, PresenceIndex, appearance,
+                      appearance_batch, appearance_log, count_intersection_seconds, find_intersection, intersect_many,
+                      merge_intervals, np)
+
+# Выше этого числа сегментов попарный перебор занимает минуты и не запускается
+LEGACY_LIMIT = 3_000
+
+
+# Исходная реализация appearance с попарным перебором интервалов, с которой сравнивается текущая
+def legacy_appearance(intervals: dict[str, list[int]]) -> int:
+
+    lesson_interval = intervals['lesson']
+
+    pupil_lessons_intervals = []
+    tutor_lessons_intervals = []
+
+    for j in range(0, len(intervals['pupil']), 2):
+        valid_intersection = find_intersection(lesson_interval, intervals['pupil'][j: j + 2])
+        if valid_intersection is not None:
+            pupil_lessons_intervals.append(valid_intersection)
+
+    for j in range(0, len(intervals['tutor']), 2):
+        valid_intersection = find_intersection(lesson_interval, intervals['tutor'][j: j + 2])
+        if valid_intersection is not None:
+            tutor_lessons_intervals.append(valid_intersection)
+
+    if not pupil_lessons_intervals or not tutor_lessons_intervals:
+        return 0
+
+    merged_pupil_intervals = merge_intervals(pupil_lessons_intervals)
+    merged_tutor_intervals = merge_intervals(tutor_lessons_intervals)
+
+    common_seconds = 0
+    for pupil_interval in merged_pupil_intervals:
+        for tutor_interval in merged_tutor_intervals:
+            common_seconds += count_intersection_seconds(pupil_interval, tutor_interval)
+
+    return common_seconds
+
+
+# Присутствие участника с частыми переподключениями: segments коротких сегментов
+# в случайном порядке, часть из них выходит за границы урока
+def generate_presence(generator: random.Random, lesson: list[int], segments: int) -> list[int]:
+
+    lesson_start, lesson_end = lesson
+    step = (lesson_end - lesson_start) / segments
+
+    presence = []
+    for k in range(segments):
+        start = int(lesson_start + k * step) + generator.randint(-5, 5)
+        presence.extend([start, start + generator.randint(1, max(1, int(step * 1.2)))])
+
+    # Сегменты приходят в произвольном порядке
+    pairs = [presence[j: j + 2] for j in range(0, len(presence), 2)]
+    generator.shuffle(pairs)
+    return [timestamp for pair in pairs for timestamp in pair]
+
+
+# Синтетический урок с заданным числом сегментов у каждого участника
+def generate_lesson(segments: int, seed: int = 0) -> dict[str, list[int]]:
+
+    generator = random.Random(seed)
+    lesson = [1_600_000_000, 1_600_000_000 + max(3600, segments * 10)]
+
+    return {'lesson': lesson,
+            'pupil': generate_presence(generator, lesson, segments),
+            'tutor': generate_presence(generator, lesson, segments)}
+
+
+# Время выполнения в миллисекундах (лучшее из нескольких повторов)
+def measure(func, intervals: dict[str, list[int]], repeat: int = 3) -> tuple[float, int]:
+
+    best = float('inf')
+    result = 0
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(intervals)
+        best = min(best, time.perf_counter() - started)
+
+    return best * 1000, result
+
+
+# appearance через intersect_many: урок - третий «участник», пересечение с ним обрезает интервалы
+def appearance_many(intervals: dict[str, list[int]]) -> int:
+
+    pupil = [intervals['pupil'][j: j + 2] for j in range(0, len(intervals['pupil']), 2)]
+    tutor = [intervals['tutor'][j: j + 2] for j in range(0, len(intervals['tutor']), 2)]
+
+    return sum(end - start for start, end in intersect_many(pupil, tutor, [intervals['lesson']]))
+
+
+def run_benchmark(sizes: tuple[int, ...] = (1_000, 3_000, 10_000, 30_000, 100_000)):
+
+    print(f'{"сегментов":>10}{"попарно":>14}{"два указателя":>16}{"intersect_many":>16}{"numpy":>14}')
+
+    for segments in sizes:
+
+        intervals = generate_lesson(segments)
+
+        current, expected = measure(partial(appearance, backend='python'), intervals)
+
+        many, result = measure(appearance_many, intervals)
+        assert result == expected, f'intersect_many: {result} != {expected}'
+
+        if segments <= LEGACY_LIMIT:
+            legacy, result = measure(legacy_appearance, intervals, repeat=1)
+            assert result == expected, f'legacy_appearance: {result} != {expected}'
+            legacy_column = f'{legacy:>11.1f} мс'
+        else:
+            legacy_column = f'{"—":>14}'
+
+        if np is not None:
+            vectorized, result = measure(partial(appearance, backend='numpy'), intervals)
+            assert result == expected, f'numpy: {result} != {expected}'
+            numpy_column = f'{vectorized:>11.1f} мс'
+        else:
+            numpy_column = f'{"—":>14}'
+
+        print(f'{segments:>10}{legacy_column}{current:>13.1f} мс{many:>13.1f} мс{numpy_column}')
+
+
+# Поток типичных уроков: по segments сегментов у ученика и учителя
+def generate_lessons(count: int, segments: int = 20):
+    for seed in range(count):
+        yield generate_lesson(segments, seed)
+
+
+# Пропускная способность appearance_batch (уроков в секунду) в зависимости от числа процессов
+def run_batch_benchmark(count: int = 20_000, chunksize: int = 500):
+
+    print(f'{"процессов":>10}{"уроков/с":>14}')
+
+    workers_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+
+    for workers in workers_counts:
+        started = time.perf_counter()
+        processed = sum(1 for _ in appearance_batch(generate_lessons(count), workers=workers, chunksize=chunksize))
+        elapsed = time.perf_counter() - started
+        print(f'{workers:>10}{processed / elapsed:>14.0f}')
+
+
+# Обрезанные и объединённые интервалы в виде списка списков [начало, конец]
+def build_list_intervals(lesson: list[int], presence: list[int]) -> list[list[int]]:
+    clipped = [interval for interval in (find_intersection(lesson, presence[j: j + 2]) for j in range(0, len(presence), 2)) if interval]
+    return merge_intervals(clipped)
+
+
+# Обрезанные и объединённые интервалы в виде IntervalSet
+def build_interval_set(lesson: list[int], presence: list[int]) -> IntervalSet:
+    return IntervalSet(presence).clip(*lesson).merge()
+
+
+# Память на один сегмент: итоговая (удерживаемая результатом) и пиковая (во время построения)
+def measure_memory(build, lesson: list[int], presence: list[int]) -> tuple[float, float, int]:
+
+    tracemalloc.start()
+    result = build(lesson, presence)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return current / len(result), peak / len(result), len(result)
+
+
+# Байт на сегмент для списка списков и IntervalSet на уроке без пересечений сегментов
+def run_memory_benchmark(sizes: tuple[int, ...] = (10_000, 100_000, 1_000_000)):
+
+    print(f'{"сегментов":>10}{"list[list] итог":>18}{"пик":>10}{"IntervalSet итог":>18}{"пик":>10}')
+
+    for segments in sizes:
+
+        lesson = [1_600_000_000, 1_600_000_000 + segments * 10]
+        presence = [timestamp for k in range(segments) for timestamp in (lesson[0] + k * 10, lesson[0] + k * 10 + 5)]
+
+        list_current, list_peak, list_count = measure_memory(build_list_intervals, lesson, presence)
+        set_current, set_peak, set_count = measure_memory(build_interval_set, lesson, presence)
+        assert list_count == set_count == segments
+
+        print(f'{segments:>10}{list_current:>14.1f} Б/с{list_peak:>6.1f} Б/с{set_current:>14.1f} Б/с{set_peak:>6.1f} Б/с')
+
+
+# Записанный поток событий урока: (время, роль, действие) в порядке поступления,
+# каждое событие опаздывает не больше чем на window секунд
+def record_events(intervals: dict[str, list[int]], window: int, seed: int = 0) -> list[tuple[int, str, str]]:
+
+    generator = random.Random(seed)
+
+    events = []
+    for role in AppearanceTracker.ROLES:
+        timestamps = intervals[role]
+        for j in range(0, len(timestamps), 2):
+            events.append((timestamps[j], role, 'join'))
+            events.append((timestamps[j + 1], role, 'leave'))
+
+    return sorted(events, key=lambda event: event[0] + generator.uniform(0, window))
+
+
+# Скорость воспроизведения записанных потоков событий через AppearanceTracker
+def run_tracker_benchmark(sizes: tuple[int, ...] = (1_000, 10_000, 100_000), window: int = 30):
+
+    print(f'{"сегментов":>10}{"событий":>10}{"событий/с":>14}{"total()":>12}')
+
+    for segments in sizes:
+
+        intervals = generate_lesson(segments)
+        events = record_events(intervals, window)
+        expected = appearance(intervals, backend='python')
+
+        started = time.perf_counter()
+        tracker = AppearanceTracker(intervals['lesson'], window=window)
+        for timestamp, role, action in events:
+            if action == 'join':
+                tracker.join(role, timestamp)
+            else:
+                tracker.leave(role, timestamp)
+        elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = tracker.total()
+        total_elapsed = time.perf_counter() - started
+        assert result == expected, f'AppearanceTracker: {result} != {expected}'
+
+        print(f'{segments:>10}{len(events):>10}{len(events) / elapsed:>14.0f}{total_elapsed * 1000:>9.2f} мс')
+
+
+# Групповой урок: один учитель и pupils учеников по segments сегментов у каждого.
+# Сравнивается вызов appearance для каждого ученика с одним GroupAppearance
+def run_group_benchmark(pupils: int = 100, segments: int = 1_000):
+
+    generator = random.Random(0)
+    lesson = [1_600_000_000, 1_600_000_000 + segments * 10]
+    participants = {'tutor': generate_presence(generator, lesson, segments)}
+    for k in range(pupils):
+        participants[f'pupil{k}'] = generate_presence(generator, lesson, segments)
+
+    started = time.perf_counter()
+    expected = {
+        name: appearance({'lesson': lesson, 'pupil': timestamps, 'tutor': participants['tutor']}, backend='python')
+        for name, timestamps in participants.items() if name != 'tutor'
+    }
+    separate = time.perf_counter() - started
+
+    started = time.perf_counter()
+    group = GroupAppearance(lesson, participants)
+    overlaps = group.overlaps()
+    everyone = group.everyone()
+    at_least_half = group.at_least(len(participants) // 2)
+    shared = time.perf_counter() - started
+    assert overlaps == expected, 'GroupAppearance расходится с appearance'
+
+    print(f'1 учитель × {pupils} учеников × {segments} сегментов')
+    print(f'{"appearance для каждого ученика":<40}{separate * 1000:>10.1f} мс')
+    print(f'{"GroupAppearance":<40}{shared * 1000:>10.1f} мс'
+          f'  (все вместе {everyone} с, не меньше половины {at_least_half} с)')
+
+
+# Пересчёт одного урока с разными границами (перезапуски, исправления времени урока):
+# без кэша и с MergedIntervalsCache
+def run_recompute_benchmark(segments: int = 100_000, windows: int = 20):
+
+    intervals = generate_lesson(segments)
+    lesson_start, lesson_end = intervals['lesson']
+    shifts = [k * (lesson_end - lesson_start) // (4 * windows) for k in range(windows)]
+    lessons = [dict(intervals, lesson=[lesson_start + shift, lesson_end - shift]) for shift in shifts]
+
+    started = time.perf_counter()
+    expected = [appearance(lesson, backend='python') for lesson in lessons]
+    uncached = time.perf_counter() - started
+
+    cache = MergedIntervalsCache()
+    started = time.perf_counter()
+    results = [appearance(lesson, cache=cache) for lesson in lessons]
+    cached = time.perf_counter() - started
+    assert results == expected, 'MergedIntervalsCache расходится с appearance'
+
+    print(f'{windows} пересчётов урока с {segments} сегментами')
+    print(f'{"без кэша":<20}{uncached * 1000:>10.1f} мс')
+    print(f'{"MergedIntervalsCache":<20}{cached * 1000:>10.1f} мс  (промахов {cache.misses}, попаданий {cache.hits})')
+
+
+# Построение PresenceIndex по lessons урокам за сутки и задержка запросов по моменту и по окну
+def run_index_benchmark(lessons: int = 50_000, queries: int = 1_000):
+
+    generator = random.Random(0)
+    day_start = 1_600_000_000
+
+    def day_lessons():
+        for lesson_id in range(lessons):
+            intervals = generate_lesson(10, seed=lesson_id)
+            shift = generator.randint(0, 86_400)
+            yield str(lesson_id), {role: [timestamp - 1_600_000_000 + day_start + shift for timestamp in timestamps]
+                                   for role, timestamps in intervals.items()}
+
+    started = time.perf_counter()
+    index = PresenceIndex(day_lessons())
+    build = time.perf_counter() - started
+
+    print(f'{lessons} уроков, {index.size} интервалов совместного присутствия, построение {build:.2f} с')
+    print(f'{"запрос":<30}{"мкс/запрос":>12}{"найдено в среднем":>20}')
+
+    for title, window in (('момент', 1), ('окно 1 минута', 60), ('окно 10 минут', 600), ('окно 1 час', 3600)):
+
+        starts = [day_start + generator.randint(0, 86_400) for _ in range(queries)]
+        found = 0
+
+        started = time.perf_counter()
+        for start in starts:
+            found += len(index.overlap_seconds(start, start + window))
+        elapsed = time.perf_counter() - started
+
+        print(f'{title:<30}{elapsed / queries * 1e6:>12.1f}{found / queries:>20.1f}')
+
+
+# Журнал посещаемости из rows строк (lesson_id, role, start, end), отсортированный по lesson_id;
+# в каждом уроке строка урока и по 10 сегментов ученика и учителя
+def generate_attendance_log(path: str, rows: int) -> None:
+
+    generator = random.Random(0)
+    rows_per_lesson = 21
+
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write('lesson_id,role,start,end\n')
+        for lesson in range(rows // rows_per_lesson):
+            intervals = generate_lesson(10, seed=generator.randrange(1 << 30))
+            lines = [f'{lesson},lesson,{intervals["lesson"][0]},{intervals["lesson"][1]}\n']
+            for role in ('pupil', 'tutor'):
+                timestamps = intervals[role]
+                lines.extend(f'{lesson},{role},{timestamps[j]},{timestamps[j + 1]}\n' for j in range(0, len(timestamps), 2))
+            file.writelines(lines)
+
+
+# Скорость обработки журнала (строк в секунду) и пиковый RSS процесса. Запускается отдельно
+# (python benchmark.py log [строк]), чтобы пиковый RSS относился только к обработке журнала
+def run_log_benchmark(rows: int = 10_000_000, use_mmap: bool = True):
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        path = os.path.join(directory, 'attendance.csv')
+        started = time.perf_counter()
+        generate_attendance_log(path, rows)
+        print(f'журнал: {os.path.getsize(path) / 2 ** 20:.0f} МБ, сгенерирован за {time.perf_counter() - started:.1f} с')
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        lessons = appearance_log(path, os.path.join(directory, 'result.csv'), use_mmap=use_mmap)
+        elapsed = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    total_rows = lessons * 21
+    print(f'{total_rows} строк, {lessons} уроков за {elapsed:.1f} с: {total_rows / elapsed:.0f} строк/с')
+    print(f'пиковый RSS: {rss_after / 1024:.0f} МБ (до обработки журнала {rss_before / 1024:.0f} МБ)')
+
+
+# appearance одного урока с segments сегментами у ученика и учителя
+@contextmanager
+def segments_case(segments: int, backend: str = 'auto'):
+    lesson = generate_lesson(segments)
+    yield lambda: appearance(lesson, backend)
+
+
+# appearance подряд для count уроков по 20 сегментов
+@contextmanager
+def lessons_case(count: int):
+    lessons = list(generate_lessons(count))
+    yield lambda: [appearance(lesson) for lesson in lessons]
+
+
+# Замеры для общего запуска из корня репозитория (../benchmark.py): имя -> контекстный менеджер,
+# который готовит данные и отдаёт замеряемый вызов без аргументов
+BENCHMARKS = {
+    **{f'appearance.segments_{segments}': partial(segments_case, segments) for segments in (100, 1_000, 10_000, 100_000)},
+    **{f'appearance.lessons_{count}': partial(lessons_case, count) for count in (10, 100, 1_000)},
+}
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'log':
+        run_log_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000)
+        sys.exit()
+
+    run_benchmark()
+    print()
+    run_batch_benchmark()
+    print()
+    run_memory_benchmark()
+    print()
+    run_tracker_benchmark()
+    print()
+    run_group_benchmark()
+    print()
+    run_recompute_benchmark()
+    print()
+    run_index_benchmark()
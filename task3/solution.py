@@ -1,4 +1,34 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import hashlib
+from heapq import heappop, heappush
+from itertools import chain, islice, tee
+import json
+import mmap
+import os
+import random
+import tempfile
+from typing import Iterable, Iterator
 import unittest
+import zlib
+
+# NumPy необязателен: без него appearance работает только на встроенных средствах языка
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+APPEARANCE_BACKENDS = ('auto', 'python', 'numpy')
+
+# Число сегментов ученика и учителя, начиная с которого backend='auto' выбирает NumPy
+NUMPY_THRESHOLD = 500
+
+# Число сегментов ученика и учителя, до которого backend='python' считает на списках пар:
+# на небольших уроках это быстрее IntervalSet, а экономия памяти array('q') там не нужна
+SMALL_LESSON_THRESHOLD = 500
 
 # Функция для поиска пересечений между двумя интервалами
 def find_intersection(interval1: list[int], interval2: [int]) -> list[int] | None:
@@ -46,8 +76,411 @@ def count_intersection_seconds(interval1: list[int], interval2: list[int]) -> in
         start, end = intersection
         return end - start
 
-# Итоговая функция, которая объединяет всю логику
-def appearance(intervals: dict[str, list[int]]) -> int:
+# Функция для поиска пересечений двух отсортированных списков непересекающихся интервалов
+# (результатов merge_intervals) за один проход двумя указателями, O(P + T)
+def intersect_intervals(intervals1: list[list[int]], intervals2: list[list[int]]) -> list[list[int]]:
+
+    intersections = []
+
+    i = j = 0
+
+    while i < len(intervals1) and j < len(intervals2):
+
+        start1, end1 = intervals1[i]
+        start2, end2 = intervals2[j]
+
+        start = max(start1, start2)
+        end = min(end1, end2)
+
+        if start < end:
+            intersections.append([start, end])
+
+        # Сдвигаем указатель интервала, который заканчивается раньше
+        if end1 < end2:
+            i += 1
+        else:
+            j += 1
+
+    return intersections
+
+# Функция для поиска промежутков, когда присутствовали все участники, по любому числу
+# списков интервалов; сортировка событий входа и выхода, O(N log N) от общего числа интервалов
+def intersect_many(*interval_sets: list[list[int]]) -> list[list[int]]:
+
+    if not interval_sets or not all(interval_sets):
+        return []
+
+    # Внутри одного участника интервалы не должны пересекаться, иначе он будет посчитан дважды
+    events = []
+    for intervals in interval_sets:
+        for start, end in merge_intervals([list(interval) for interval in intervals]):
+            if start < end:
+                events.append((start, 1))
+                events.append((end, -1))
+
+    # При равном времени выход (-1) обрабатывается раньше входа (+1): касание - не пересечение
+    events.sort()
+
+    intersections = []
+    present = 0
+    required = len(interval_sets)
+
+    for time, delta in events:
+        if delta == 1:
+            present += 1
+            if present == required:
+                intersections.append([time, time])
+        else:
+            if present == required:
+                intersections[-1][1] = time
+            present -= 1
+
+    return intersections
+
+# Набор интервалов в одном плоском буфере array('q'): [начало0, конец0, начало1, конец1, ...].
+# Занимает 16 байт на интервал вместо отдельного списка [начало, конец] на каждый сегмент.
+# Операции clip, merge и intersect изменяют набор на месте и возвращают его же,
+# поэтому их можно вызывать цепочкой
+class IntervalSet:
+
+    __slots__ = ('bounds',)
+
+    # Набор строится прямо из плоского списка таймстемпов, пары не создаются. Таймстемпы всегда
+    # копируются, в том числе переданный array('q'): операции изменяют буфер набора на месте
+    def __init__(self, timestamps: Iterable[int] = ()):
+        self.bounds = array('q', timestamps)
+
+        if len(self.bounds) % 2:
+            raise ValueError('Число таймстемпов должно быть чётным')
+
+    # Набор поверх готового буфера без копирования - только для буферов, которые больше
+    # никому не принадлежат (срезы, прочитанные с диска и т.п.)
+    @classmethod
+    def wrap(cls, bounds: array) -> 'IntervalSet':
+
+        if len(bounds) % 2:
+            raise ValueError('Число таймстемпов должно быть чётным')
+
+        intervals = cls.__new__(cls)
+        intervals.bounds = bounds
+        return intervals
+
+    def __len__(self) -> int:
+        return len(self.bounds) // 2
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        bounds = self.bounds
+        return zip(bounds[0::2], bounds[1::2])
+
+    def __repr__(self) -> str:
+        return f'IntervalSet({self.to_list()})'
+
+    def to_list(self) -> list[list[int]]:
+        return [[start, end] for start, end in self]
+
+    # Обрезка интервалов по [start, end]; интервалы, для которых find_intersection вернула бы None, удаляются
+    def clip(self, start: int, end: int) -> 'IntervalSet':
+
+        bounds = self.bounds
+        size = 0
+
+        for j in range(0, len(bounds), 2):
+            clipped_start = max(bounds[j], start)
+            clipped_end = min(bounds[j + 1], end)
+            if clipped_start <= clipped_end:
+                bounds[size] = clipped_start
+                bounds[size + 1] = clipped_end
+                size += 2
+
+        del bounds[size:]
+        return self
+
+    # Объединение пересекающихся и касающихся интервалов, как в merge_intervals
+    def merge(self) -> 'IntervalSet':
+
+        bounds = self.bounds
+
+        if len(bounds) <= 2:
+            return self
+
+        # Сортируются только позиции начал, сами интервалы не копируются в отдельные объекты;
+        # уже упорядоченные сегменты (обычный случай для журнала входов) не сортируются
+        order = range(0, len(bounds), 2)
+        if any(bounds[j] > bounds[j + 2] for j in range(0, len(bounds) - 2, 2)):
+            order = sorted(order, key=bounds.__getitem__)
+
+        merged = array('q')
+        current_start = bounds[order[0]]
+        current_end = bounds[order[0] + 1]
+
+        for j in order:
+            start = bounds[j]
+            end = bounds[j + 1]
+            if start <= current_end:
+                if end > current_end:
+                    current_end = end
+            else:
+                merged.append(current_start)
+                merged.append(current_end)
+                current_start = start
+                current_end = end
+
+        merged.append(current_start)
+        merged.append(current_end)
+
+        self.bounds = merged
+        return self
+
+    # Пересечение с другим объединённым набором двумя указателями, как в intersect_intervals
+    def intersect(self, other: 'IntervalSet') -> 'IntervalSet':
+
+        bounds1 = self.bounds
+        bounds2 = other.bounds
+        intersections = array('q')
+
+        i = j = 0
+
+        while i < len(bounds1) and j < len(bounds2):
+
+            end1 = bounds1[i + 1]
+            end2 = bounds2[j + 1]
+
+            start = max(bounds1[i], bounds2[j])
+            end = min(end1, end2)
+
+            if start < end:
+                intersections.append(start)
+                intersections.append(end)
+
+            if end1 < end2:
+                i += 2
+            else:
+                j += 2
+
+        self.bounds = intersections
+        return self
+
+    # Суммарная длина интервалов в секундах
+    def total(self) -> int:
+        return sum(self.bounds[1::2]) - sum(self.bounds[0::2])
+
+# Кэш объединённых интервалов участника, ключ - хэш содержимого плоского списка таймстемпов.
+# Интервалы объединяются без обрезки уроком, поэтому одну запись можно использовать при любых
+# границах урока: clipped() находит нужный диапазон двоичным поиском вместо сортировки заново.
+# Записи вытесняются по LRU; если задан directory, то записи дополнительно сохраняются на диск
+# в файлы <ключ>.bin - сырые байты array('q') - и читаются оттуда при промахе в памяти
+class MergedIntervalsCache:
+
+    __slots__ = ('maxsize', 'directory', 'entries', 'hits', 'disk_hits', 'misses')
+
+    def __init__(self, maxsize: int = 1024, directory: str | None = None):
+
+        if maxsize < 1:
+            raise ValueError('Размер кэша должен быть положительным')
+
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(timestamps: Iterable[int]) -> str:
+        buffer = timestamps if isinstance(timestamps, array) else array('q', timestamps)
+        return hashlib.blake2b(buffer.tobytes(), digest_size=16).hexdigest()
+
+    # Объединённые интервалы без обрезки; возвращаемый набор общий для всех вызовов и не должен изменяться
+    def merged(self, timestamps: Iterable[int]) -> IntervalSet:
+
+        raw = timestamps if isinstance(timestamps, array) else array('q', timestamps)
+        key = self.key(raw)
+
+        intervals = self.entries.get(key)
+
+        if intervals is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return intervals
+
+        intervals = self.load(key)
+
+        if intervals is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            # Обрезка по всему диапазону int64 только отбрасывает сегменты с концом раньше начала
+            intervals = IntervalSet(raw).clip(-2 ** 63, 2 ** 63 - 1).merge()
+            self.save(key, intervals)
+
+        self.entries[key] = intervals
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return intervals
+
+    # Объединённые интервалы, обрезанные по [start, end]; результат - новый набор, его можно изменять
+    def clipped(self, timestamps: Iterable[int], start: int, end: int) -> IntervalSet:
+
+        bounds = self.merged(timestamps).bounds
+        count = len(bounds) // 2
+
+        # Окно с концом раньше начала пустое, как и в IntervalSet.clip()
+        if start > end:
+            return IntervalSet.wrap(bounds[:0])
+
+        # Первый интервал, который заканчивается не раньше start, и первый, который начинается позже end
+        first = bisect_left(range(count), start, key=lambda index: bounds[2 * index + 1])
+        last = bisect_right(range(count), end, key=lambda index: bounds[2 * index])
+
+        clipped = bounds[2 * first: 2 * last]
+        if clipped:
+            clipped[0] = max(clipped[0], start)
+            clipped[-1] = min(clipped[-1], end)
+
+        return IntervalSet.wrap(clipped)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.bin')
+
+    def load(self, key: str) -> IntervalSet | None:
+
+        if self.directory is None:
+            return None
+
+        try:
+            with open(self.path(key), 'rb') as file:
+                bounds = array('q')
+                bounds.frombytes(file.read())
+        except FileNotFoundError:
+            return None
+
+        return IntervalSet.wrap(bounds)
+
+    # Запись через временный файл и os.replace, чтобы параллельные процессы не прочитали половину записи
+    def save(self, key: str, intervals: IntervalSet) -> None:
+
+        if self.directory is None:
+            return
+
+        temporary_path = f'{self.path(key)}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(intervals.bounds.tobytes())
+        os.replace(temporary_path, self.path(key))
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+# Функция для обрезки сегментов уроком и объединения пересекающихся сегментов на NumPy.
+# Принимает плоский массив таймстемпов, возвращает массивы начал и концов объединённых интервалов.
+# Сегмент остаётся, если max(начало, начало урока) <= min(конец, конец урока) - как в find_intersection
+def merge_intervals_numpy(timestamps, lesson_start: int, lesson_end: int):
+
+    starts = timestamps[0::2]
+    ends = timestamps[1::2]
+
+    valid = (starts <= lesson_end) & (ends >= lesson_start) & (starts <= ends)
+    starts = np.clip(starts[valid], lesson_start, lesson_end)
+    ends = np.clip(ends[valid], lesson_start, lesson_end)
+
+    if not len(starts):
+        return starts, ends
+
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    ends = ends[order]
+
+    # Новый интервал начинается там, где сегмент стартует позже всех предыдущих концов
+    running_ends = np.maximum.accumulate(ends)
+    group_start = np.empty(len(starts), dtype=bool)
+    group_start[0] = True
+    np.greater(starts[1:], running_ends[:-1], out=group_start[1:])
+
+    first_indexes = np.flatnonzero(group_start)
+    last_indexes = np.append(first_indexes[1:] - 1, len(starts) - 1)
+
+    return starts[first_indexes], running_ends[last_indexes]
+
+# Функция для подсчёта секунд пересечения двух наборов непересекающихся интервалов на NumPy:
+# события входа (+1) и выхода (-1) сортируются, выход раньше входа при равном времени,
+# и суммируются промежутки, на которых присутствуют оба участника
+def count_common_seconds_numpy(starts1, ends1, starts2, ends2) -> int:
+
+    times = np.concatenate((starts1, starts2, ends1, ends2))
+    deltas = np.concatenate((
+        np.ones(len(starts1) + len(starts2), dtype=np.int64),
+        np.full(len(ends1) + len(ends2), -1, dtype=np.int64),
+    ))
+
+    order = np.lexsort((deltas, times))
+    times = times[order]
+    present = np.cumsum(deltas[order])
+
+    both_present = present[:-1] == 2
+    return int(np.sum(np.diff(times)[both_present]))
+
+# Вариант appearance на NumPy для уроков с большим числом сегментов
+def appearance_numpy(lesson_interval: list[int], pupil: list[int], tutor: list[int]) -> int:
+
+    lesson_start, lesson_end = lesson_interval
+
+    pupil_starts, pupil_ends = merge_intervals_numpy(np.asarray(pupil, dtype=np.int64), lesson_start, lesson_end)
+    tutor_starts, tutor_ends = merge_intervals_numpy(np.asarray(tutor, dtype=np.int64), lesson_start, lesson_end)
+
+    if not len(pupil_starts) or not len(tutor_starts):
+        return 0
+
+    return count_common_seconds_numpy(pupil_starts, pupil_ends, tutor_starts, tutor_ends)
+
+# Вариант merge для небольших уроков: сегменты обрезаются уроком и объединяются в списке пар
+# (start, end). Сегменты, для которых find_intersection вернула бы None, отбрасываются
+def merge_clipped_pairs(timestamps: list[int], lesson_start: int, lesson_end: int) -> list[tuple[int, int]]:
+
+    pairs = []
+
+    for start, end in zip(timestamps[0::2], timestamps[1::2]):
+        if start < lesson_start:
+            start = lesson_start
+        if end > lesson_end:
+            end = lesson_end
+        if start <= end:
+            pairs.append((start, end))
+
+    if not pairs:
+        return pairs
+
+    pairs.sort()
+
+    merged = []
+    current_start, current_end = pairs[0]
+
+    for start, end in pairs:
+        if start <= current_end:
+            if end > current_end:
+                current_end = end
+        else:
+            merged.append((current_start, current_end))
+            current_start = start
+            current_end = end
+
+    merged.append((current_start, current_end))
+    return merged
+
+# Итоговая функция, которая объединяет всю логику. backend выбирает реализацию:
+# 'python' - встроенные средства языка, 'numpy' - векторизованный вариант,
+# 'auto' - NumPy, если он установлен, сегментов не меньше NUMPY_THRESHOLD и не передан cache.
+# cache - MergedIntervalsCache для повторных расчётов по тем же интервалам с другими границами урока
+def appearance(intervals: dict[str, list[int]], backend: str = 'auto', cache: MergedIntervalsCache | None = None) -> int:
+
+    if backend not in APPEARANCE_BACKENDS:
+        raise ValueError(f'Неизвестная реализация: {backend!r}, допустимые: {", ".join(APPEARANCE_BACKENDS)}')
+
+    if backend == 'numpy' and np is None:
+        raise ImportError('Для backend="numpy" требуется пакет numpy')
 
     if not intervals or not all(key in intervals for key in ['pupil', 'tutor', 'lesson']):
         return 0
@@ -60,67 +493,529 @@ def appearance(intervals: dict[str, list[int]]) -> int:
     if not lesson_interval or lesson_interval[0] - lesson_interval[1] == 0:
         return 0
 
-    pupil_lessons_intervals = []
-    tutor_lessons_intervals = []
+    if backend == 'auto':
+        segments = (len(intervals['pupil']) + len(intervals['tutor'])) // 2
+        backend = 'numpy' if np is not None and segments >= NUMPY_THRESHOLD and cache is None else 'python'
 
-    for j in range(0, len(intervals['pupil']), 2):
-        valid_intersection = find_intersection(lesson_interval, intervals['pupil'][j: j + 2])
-        if valid_intersection is not None:
-            pupil_lessons_intervals.append(valid_intersection)
+    if backend == 'numpy':
+        return appearance_numpy(lesson_interval, intervals['pupil'], intervals['tutor'])
 
-    for j in range(0, len(intervals['tutor']), 2):
-        valid_intersection = find_intersection(lesson_interval, intervals['tutor'][j: j + 2])
-        if valid_intersection is not None:
-            tutor_lessons_intervals.append(valid_intersection)
+    lesson_start, lesson_end = lesson_interval
 
-    if not pupil_lessons_intervals or not tutor_lessons_intervals:
-        return 0
+    if cache is None and len(intervals['pupil']) + len(intervals['tutor']) < 2 * SMALL_LESSON_THRESHOLD:
+        pupil_intervals = merge_clipped_pairs(intervals['pupil'], lesson_start, lesson_end)
+        tutor_intervals = merge_clipped_pairs(intervals['tutor'], lesson_start, lesson_end)
+        return sum(end - start for start, end in intersect_intervals(pupil_intervals, tutor_intervals))
+
+    if cache is not None:
+        pupil_intervals = cache.clipped(intervals['pupil'], lesson_start, lesson_end)
+        tutor_intervals = cache.clipped(intervals['tutor'], lesson_start, lesson_end)
+    else:
+        pupil_intervals = IntervalSet(intervals['pupil']).clip(lesson_start, lesson_end).merge()
+        tutor_intervals = IntervalSet(intervals['tutor']).clip(lesson_start, lesson_end).merge()
+
+    return pupil_intervals.intersect(tutor_intervals).total()
+
+# Инкрементальный подсчёт appearance по событиям входа и выхода, поступающим во время урока.
+# События могут приходить не по порядку в пределах окна window секунд: они копятся в куче
+# и применяются по возрастанию времени, когда время события отстаёт от самого позднего
+# из полученных больше чем на window. Для каждой роли хранится число открытых подключений,
+# поэтому пересекающиеся подключения одного участника считаются один раз, как в merge_intervals.
+# Подключения из журнала, где вход и выход известны сразу, передаются в add_interval.
+# Каждое событие обрабатывается за O(log n) от числа ожидающих в окне событий.
+class AppearanceTracker:
+
+    __slots__ = ('lesson_start', 'lesson_end', 'window', 'pending', 'latest', 'time', 'present', 'seconds')
+
+    ROLES = ('pupil', 'tutor')
+
+    def __init__(self, lesson: list[int], window: int = 60):
+
+        if window < 0:
+            raise ValueError('Окно переупорядочивания не может быть отрицательным')
+
+        self.lesson_start, self.lesson_end = lesson
+        self.window = window
+        self.pending = []                 # куча событий (время, +1/-1, номер роли)
+        self.latest = None                # самое позднее время среди полученных событий
+        self.time = None                  # время последнего применённого события
+        self.present = [0, 0]             # число открытых подключений ученика и учителя
+        self.seconds = 0                  # секунды совместного присутствия до self.time
+
+    def join(self, role: str, timestamp: int) -> None:
+        self.add_event(role, timestamp, 1)
+
+    def leave(self, role: str, timestamp: int) -> None:
+        self.add_event(role, timestamp, -1)
+
+    def add_event(self, role: str, timestamp: int, delta: int) -> None:
+        self.push_event(role, timestamp, delta)
+        self.receive(timestamp)
+
+    # Подключение целиком: вход start и выход end. Время получения - start, выход ждёт в куче.
+    # Сегменты с выходом раньше входа отбрасываются, как в find_intersection и IntervalSet.clip:
+    # по отдельности их события сбили бы счётчик открытых подключений роли
+    def add_interval(self, role: str, start: int, end: int) -> None:
+
+        if start > end:
+            return
+
+        self.push_event(role, start, 1)
+        self.push_event(role, end, -1)
+        self.receive(start)
+
+    def push_event(self, role: str, timestamp: int, delta: int) -> None:
+
+        if role not in self.ROLES:
+            raise ValueError(f'Неизвестная роль: {role!r}, допустимые: {", ".join(self.ROLES)}')
+
+        if self.time is not None and timestamp < self.time:
+            raise ValueError(f'Событие {timestamp} пришло позже окна переупорядочивания ({self.window} с)')
+
+        heappush(self.pending, (timestamp, delta, self.ROLES.index(role)))
+
+    # Сдвиг самого позднего времени получения и применение событий, которые уже не могут быть опережены
+    def receive(self, timestamp: int) -> None:
+
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+
+        # Применяем события, которые уже не могут быть опережены новыми
+        watermark = self.latest - self.window
+        while self.pending and self.pending[0][0] <= watermark:
+            timestamp, delta, role_index = heappop(self.pending)
+            self.seconds += self.common_seconds(self.present, self.time, timestamp)
+            self.present[role_index] += delta
+            self.time = timestamp
+
+    # Секунды совместного присутствия на промежутке [start, end], обрезанном уроком
+    def common_seconds(self, present: list[int], start: int | None, end: int) -> int:
+
+        if start is None or present[0] <= 0 or present[1] <= 0:
+            return 0
+
+        return max(0, min(end, self.lesson_end) - max(start, self.lesson_start))
+
+    # Текущее время совместного присутствия с учётом ещё не применённых событий.
+    # Если передан until, то подключения, открытые на момент until, считаются до него
+    def total(self, until: int | None = None) -> int:
+
+        seconds = self.seconds
+        time = self.time
+        present = list(self.present)
+
+        for timestamp, delta, role_index in sorted(self.pending):
+            seconds += self.common_seconds(present, time, timestamp)
+            present[role_index] += delta
+            time = timestamp
+
+        if until is not None:
+            seconds += self.common_seconds(present, time, until)
+
+        return seconds
+
+# Присутствие на групповом уроке с любым числом участников. Интервалы каждого участника
+# обрезаются уроком и объединяются один раз, затем все события входа и выхода проходятся
+# одним общим проходом по времени, O(N log N) от общего числа интервалов. Во время прохода
+# считаются:
+# - совместное присутствие каждого участника с ведущим участником anchor (обычно учителем):
+#   накопленное время присутствия anchor запоминается при входе участника и вычитается при выходе;
+# - coverage[c] - сколько секунд урока на нём было ровно c участников.
+class GroupAppearance:
+
+    __slots__ = ('names', 'anchor', 'pair_seconds', 'coverage')
+
+    def __init__(self, lesson: list[int], participants: dict[str, list[int]], anchor: str = 'tutor'):
+
+        if anchor not in participants:
+            raise ValueError(f'Участник {anchor!r} отсутствует среди участников урока')
+
+        lesson_start, lesson_end = lesson
+
+        self.names = list(participants)
+        self.anchor = anchor
+
+        events = []
+        for index, name in enumerate(self.names):
+            for start, end in IntervalSet(participants[name]).clip(lesson_start, lesson_end).merge():
+                if start < end:
+                    events.append((start, 1, index))
+                    events.append((end, -1, index))
+
+        # При равном времени выход обрабатывается раньше входа: касание - не пересечение
+        events.sort()
+
+        anchor_index = self.names.index(anchor)
+        anchor_present = False
+        anchor_seconds = 0                        # накопленное время присутствия anchor
+        anchor_seconds_at_join = [0] * len(self.names)
+        pair_seconds = [0] * len(self.names)
+
+        coverage = [0] * (len(self.names) + 1)
+        present = 0
+        previous_time = None
+
+        for time, delta, index in events:
+
+            if previous_time is not None:
+                coverage[present] += time - previous_time
+                if anchor_present:
+                    anchor_seconds += time - previous_time
+            previous_time = time
+
+            if index == anchor_index:
+                anchor_present = delta == 1
+                if delta == -1:
+                    pair_seconds[index] = anchor_seconds
+            elif delta == 1:
+                anchor_seconds_at_join[index] = anchor_seconds
+            else:
+                pair_seconds[index] += anchor_seconds - anchor_seconds_at_join[index]
+
+            present += delta
+
+        # Остаток урока - время, когда не было никого
+        coverage[0] = max(0, lesson_end - lesson_start - sum(coverage[1:]))
+
+        self.pair_seconds = dict(zip(self.names, pair_seconds))
+        self.coverage = coverage
+
+    # Время совместного присутствия участника name и anchor; для самого anchor - его время присутствия
+    def overlap(self, name: str) -> int:
+        return self.pair_seconds[name]
+
+    # Время совместного присутствия с anchor для всех остальных участников
+    def overlaps(self) -> dict[str, int]:
+        return {name: seconds for name, seconds in self.pair_seconds.items() if name != self.anchor}
 
-    merged_pupil_intervals = merge_intervals(pupil_lessons_intervals)
-    merged_tutor_intervals = merge_intervals(tutor_lessons_intervals)
+    # Время, когда на уроке было не меньше k участников
+    def at_least(self, k: int) -> int:
 
-    common_seconds = 0
-    for pupil_interval in merged_pupil_intervals:
-        for tutor_interval in merged_tutor_intervals:
-            common_seconds += count_intersection_seconds(pupil_interval, tutor_interval)
+        if k < 1:
+            raise ValueError('Число участников должно быть положительным')
 
-    return common_seconds
+        return sum(self.coverage[k:])
+
+    # Время, когда на уроке были все участники
+    def everyone(self) -> int:
+        return self.coverage[-1]
+
+# Узел дерева PresenceIndex: интервалы, содержащие center, отсортированные по началу
+# и по убыванию конца, и поддеревья интервалов целиком левее и целиком правее center
+class PresenceIndexNode:
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals: list[tuple[int, int, str]]):
+
+        endpoints = sorted(bound for start, end, _ in intervals for bound in (start, end))
+        self.center = center = endpoints[len(endpoints) // 2]
+
+        left = [interval for interval in intervals if interval[1] < center]
+        right = [interval for interval in intervals if interval[0] > center]
+        here = [interval for interval in intervals if interval[0] <= center <= interval[1]]
+
+        self.by_start = sorted(here)
+        self.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        self.left = PresenceIndexNode(left) if left else None
+        self.right = PresenceIndexNode(right) if right else None
+
+# Индекс совместного присутствия ученика и учителя по многим урокам для запросов вида
+# «на каких уроках оба были в момент T / в течение окна W». Для каждого урока интервалы
+# обрезаются уроком, объединяются и пересекаются через IntervalSet, полученные интервалы
+# совместного присутствия всех уроков складываются в центрированное дерево интервалов.
+# Запрос обходит O(log n) узлов и просматривает только подходящие интервалы: O(log n + k)
+class PresenceIndex:
+
+    __slots__ = ('root', 'size')
+
+    def __init__(self, lessons: Iterable[tuple[str, dict[str, list[int]]]]):
+
+        intervals = []
+
+        for lesson_id, lesson in lessons:
+            if not lesson.get('lesson'):
+                continue
+            lesson_start, lesson_end = lesson['lesson']
+            pupil = IntervalSet(lesson['pupil']).clip(lesson_start, lesson_end).merge()
+            tutor = IntervalSet(lesson['tutor']).clip(lesson_start, lesson_end).merge()
+            intervals.extend((start, end, lesson_id) for start, end in pupil.intersect(tutor))
+
+        self.size = len(intervals)
+        self.root = PresenceIndexNode(intervals) if intervals else None
+
+    # Интервалы совместного присутствия, пересекающиеся с [start, end) на ненулевую длину
+    def search(self, start: int, end: int) -> Iterator[tuple[int, int, str]]:
+
+        stack = [self.root] if self.root is not None else []
+
+        while stack:
+
+            node = stack.pop()
+
+            if end <= node.center:
+                # Все интервалы узла заканчиваются не раньше center >= end, нужны начавшиеся до end
+                for interval in node.by_start:
+                    if interval[0] >= end:
+                        break
+                    yield interval
+                if node.left is not None:
+                    stack.append(node.left)
+            elif start >= node.center:
+                # Все интервалы узла начинаются не позже center <= start, нужны закончившиеся после start
+                for interval in node.by_end:
+                    if interval[1] <= start:
+                        break
+                    yield interval
+                if node.right is not None:
+                    stack.append(node.right)
+            else:
+                yield from node.by_start
+                if node.left is not None:
+                    stack.append(node.left)
+                if node.right is not None:
+                    stack.append(node.right)
+
+    # Уроки, на которых ученик и учитель оба присутствовали в момент timestamp
+    def present_at(self, timestamp: int) -> set[str]:
+        return {lesson_id for _, _, lesson_id in self.search(timestamp, timestamp + 1)}
+
+    # Уроки, на которых ученик и учитель оба присутствовали хотя бы часть окна [start, end)
+    def present_during(self, start: int, end: int) -> set[str]:
+        return {lesson_id for _, _, lesson_id in self.search(start, end)}
+
+    # Секунды совместного присутствия внутри окна [start, end) для каждого подходящего урока
+    def overlap_seconds(self, start: int, end: int) -> dict[str, int]:
+
+        seconds = {}
+        for interval_start, interval_end, lesson_id in self.search(start, end):
+            seconds[lesson_id] = seconds.get(lesson_id, 0) + min(interval_end, end) - max(interval_start, start)
+
+        return seconds
+
+# Функция для обработки одной пачки уроков в процессе-обработчике
+def appearance_chunk(lessons: list[dict[str, list[int]]]) -> list[int]:
+    return [appearance(intervals) for intervals in lessons]
+
+# Функция для подсчёта appearance по потоку уроков в нескольких процессах. Уроки читаются
+# из iterable пачками по chunksize, одновременно в работе не больше 2 * workers пачек,
+# поэтому в памяти никогда не находится весь поток. Результаты выдаются в порядке уроков.
+# При workers=1 или если пул процессов недоступен, уроки считаются в текущем процессе.
+def appearance_batch(lessons: Iterable[dict[str, list[int]]], workers: int | None = None, chunksize: int = 1000) -> Iterator[int]:
+
+    if chunksize < 1:
+        raise ValueError('Размер пачки должен быть положительным')
+
+    workers = workers or os.cpu_count() or 1
+    lessons = iter(lessons)
+
+    if workers == 1:
+        yield from map(appearance, lessons)
+        return
+
+    try:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    except (NotImplementedError, OSError):
+        yield from map(appearance, lessons)
+        return
+
+    with executor:
+
+        pending = deque()
+
+        while True:
+
+            while len(pending) < 2 * workers:
+                chunk = list(islice(lessons, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(appearance_chunk, chunk))
+
+            if not pending:
+                break
+
+            yield from pending.popleft().result()
+
+# Функция для чтения строк журнала посещаемости (lesson_id, role, start, end) из CSV или JSONL.
+# Файл читается построчно блоками по chunk_size байт либо через mmap, целиком в память не загружается.
+# Формат определяется по расширению: .jsonl и .json - JSON Lines, остальные - CSV с необязательным заголовком.
+# Поля CSV могут быть в кавычках, как их пишет csv.writer
+def read_attendance_rows(path: str, use_mmap: bool = False, chunk_size: int = 1 << 20) -> Iterator[tuple[str, str, int, int]]:
+
+    is_jsonl = path.endswith(('.jsonl', '.json'))
+
+    with open(path, 'rb', buffering=chunk_size) as file:
+
+        if use_mmap and os.fstat(file.fileno()).st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield from parse_attendance_lines(iter(mapped.readline, b''), is_jsonl)
+        else:
+            yield from parse_attendance_lines(file, is_jsonl)
+
+# Функция для разбора строк журнала посещаемости. Строки CSV без кавычек (обычный случай) разбираются
+# на уровне байтов, строки с кавычками - модулем csv, который сам дочитывает следующие строки,
+# если поле в кавычках содержит перевод строки. Заголовок CSV - первая строка, в которой начало не число
+def parse_attendance_lines(lines: Iterable[bytes], is_jsonl: bool) -> Iterator[tuple[str, str, int, int]]:
+
+    lines = iter(lines)
+    first_row = not is_jsonl
+
+    for line in lines:
+
+        text = line.decode()
+        if not text or text.isspace():
+            continue
+
+        if is_jsonl:
+            row = json.loads(text)
+            yield str(row['lesson_id']), row['role'], int(row['start']), int(row['end'])
+            continue
+
+        # Проверка кавычек в str, а не в bytes: для одного символа она заметно быстрее
+        if '"' in text:
+            reader = csv.reader(chain([text], (next_line.decode() for next_line in lines)))
+            lesson_id, role, start, end = next(reader)
+        else:
+            lesson_id, role, start, end = text.split(',')
+
+        try:
+            start, end = int(start), int(end)
+        except ValueError:
+            if first_row:
+                first_row = False
+                continue
+            raise
+
+        first_row = False
+        yield lesson_id, role, start, end
+
+# Функция для сборки уроков из строк журнала, в которых строки одного урока идут подряд
+# (так устроены выгрузки, отсортированные по lesson_id). В памяти держится только текущий урок.
+# Строка с ролью 'lesson' задаёт границы урока, строки 'pupil' и 'tutor' - интервалы присутствия.
+# Если строки урока встречаются снова после строк другого урока, журнал не сгруппирован - ValueError
+def group_lessons(rows: Iterable[tuple[str, str, int, int]]) -> Iterator[tuple[str, dict[str, list[int]]]]:
+
+    current_id = None
+    intervals = None
+    finished = set()
+
+    for lesson_id, role, start, end in rows:
+
+        if lesson_id != current_id:
+            if lesson_id in finished:
+                raise ValueError(f'Строки урока {lesson_id} идут не подряд; для такого журнала нужен grouped=False')
+            if current_id is not None:
+                finished.add(current_id)
+                yield current_id, intervals
+            current_id = lesson_id
+            intervals = {'lesson': [], 'pupil': [], 'tutor': []}
+
+        if role == 'lesson':
+            intervals['lesson'] = [start, end]
+        elif role in intervals:
+            intervals[role].extend((start, end))
+        else:
+            raise ValueError(f'Неизвестная роль {role!r} в строке урока {lesson_id}')
+
+    if current_id is not None:
+        yield current_id, intervals
+
+# Функция для сборки уроков из неотсортированного журнала: строки раскладываются по buckets
+# временным файлам по хэшу lesson_id, затем каждый файл группируется в памяти отдельно.
+# В памяти одновременно находятся только уроки одного файла-корзины
+def partition_lessons(rows: Iterable[tuple[str, str, int, int]], buckets: int = 64) -> Iterator[tuple[str, dict[str, list[int]]]]:
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        paths = [os.path.join(directory, f'{bucket}.csv') for bucket in range(buckets)]
+        files = [open(path, 'w', encoding='utf-8', newline='') for path in paths]
+
+        try:
+            writers = [csv.writer(file) for file in files]
+            for row in rows:
+                writers[zlib.crc32(row[0].encode()) % buckets].writerow(row)
+        finally:
+            for file in files:
+                file.close()
+
+        for path in paths:
+
+            lessons = {}
+            for lesson_id, role, start, end in read_attendance_rows(path):
+                lessons.setdefault(lesson_id, []).append((lesson_id, role, start, end))
+
+            for lesson_rows in lessons.values():
+                yield from group_lessons(lesson_rows)
+
+# Функция для подсчёта appearance по журналу посещаемости с записью результатов в CSV (lesson_id, seconds).
+# Уроки читаются, считаются и записываются потоком; grouped=False включает раскладку по временным
+# файлам для журналов, в которых строки одного урока разбросаны по файлу. Возвращает число уроков
+def appearance_log(path: str, output_path: str, grouped: bool = True, use_mmap: bool = False,
+                   chunk_size: int = 1 << 20, workers: int = 1) -> int:
+
+    rows = read_attendance_rows(path, use_mmap=use_mmap, chunk_size=chunk_size)
+    lessons = group_lessons(rows) if grouped else partition_lessons(rows)
+
+    # Идентификаторы и интервалы идут в appearance_batch и в запись результата двумя потоками,
+    # appearance_batch сохраняет порядок уроков, поэтому они совпадают
+    ids, intervals = tee(lessons)
+    ids = (lesson_id for lesson_id, _ in ids)
+    intervals = (lesson_intervals for _, lesson_intervals in intervals)
+
+    count = 0
+
+    with open(output_path, mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['lesson_id', 'seconds'])
+        for lesson_id, seconds in zip(ids, appearance_batch(intervals, workers=workers)):
+            writer.writerow([lesson_id, seconds])
+            count += 1
+
+    return count
 
 class TestAppearanceFunction(unittest.TestCase):
 
+    # Реализация appearance, на которой запускаются тесты; подклассы задают свою
+    backend = 'auto'
+
+    def appearance(self, intervals: dict[str, list[int]]) -> int:
+        return appearance(intervals, backend=self.backend)
+
+    # Примеры из условия задачи
+    provided_tests = [
+        {'intervals': {'lesson': [1594663200, 1594666800],
+                       'pupil': [1594663340, 1594663389, 1594663390, 1594663395, 1594663396, 1594666472],
+                       'tutor': [1594663290, 1594663430, 1594663443, 1594666473]},
+         'answer': 3117},
+        {'intervals': {'lesson': [1594702800, 1594706400],
+                       'pupil': [1594702789, 1594704500, 1594702807, 1594704542, 1594704512, 1594704513, 1594704564, 1594705150, 1594704581, 1594704582, 1594704734, 1594705009, 1594705095, 1594705096, 1594705106, 1594706480, 1594705158, 1594705773, 1594705849, 1594706480, 1594706500, 1594706875, 1594706502, 1594706503, 1594706524, 1594706524, 1594706579, 1594706641],
+                       'tutor': [1594700035, 1594700364, 1594702749, 1594705148, 1594705149, 1594706463]},
+         'answer': 3577},
+        {'intervals': {'lesson': [1594692000, 1594695600],
+                       'pupil': [1594692033, 1594696347],
+                       'tutor': [1594692017, 1594692066, 1594692068, 1594696341]},
+         'answer': 3565},
+    ]
+
     def test_provided_examples(self):
         """Тесты на основе предоставленных примеров."""
-        provided_tests = [
-            {'intervals': {'lesson': [1594663200, 1594666800],
-                           'pupil': [1594663340, 1594663389, 1594663390, 1594663395, 1594663396, 1594666472],
-                           'tutor': [1594663290, 1594663430, 1594663443, 1594666473]},
-             'answer': 3117},
-            {'intervals': {'lesson': [1594702800, 1594706400],
-                           'pupil': [1594702789, 1594704500, 1594702807, 1594704542, 1594704512, 1594704513, 1594704564, 1594705150, 1594704581, 1594704582, 1594704734, 1594705009, 1594705095, 1594705096, 1594705106, 1594706480, 1594705158, 1594705773, 1594705849, 1594706480, 1594706500, 1594706875, 1594706502, 1594706503, 1594706524, 1594706524, 1594706579, 1594706641],
-                           'tutor': [1594700035, 1594700364, 1594702749, 1594705148, 1594705149, 1594706463]},
-             'answer': 3577},
-            {'intervals': {'lesson': [1594692000, 1594695600],
-                           'pupil': [1594692033, 1594696347],
-                           'tutor': [1594692017, 1594692066, 1594692068, 1594696341]},
-             'answer': 3565},
-        ]
-        for i, test_case in enumerate(provided_tests):
+        for i, test_case in enumerate(self.provided_tests):
             with self.subTest(f"Предоставленный тестовый случай {i}"):
-                self.assertEqual(appearance(test_case['intervals']), test_case['answer'])
+                self.assertEqual(self.appearance(test_case['intervals']), test_case['answer'])
 
     def test_no_overlap_between_pupil_and_tutor(self):
         """Тест: нет пересечения между учеником и учителем."""
         intervals = {'lesson': [0, 1000],
                      'pupil': [100, 200],
                      'tutor': [300, 400]}
-        self.assertEqual(appearance(intervals), 0)
+        self.assertEqual(self.appearance(intervals), 0)
 
     def test_full_overlap_pupil_tutor_lesson(self):
         """Тест: полное пересечение ученика, учителя и урока."""
         intervals = {'lesson': [0, 100],
                      'pupil': [0, 100],
                      'tutor': [0, 100]}
-        self.assertEqual(appearance(intervals), 100)
+        self.assertEqual(self.appearance(intervals), 100)
 
     def test_partial_overlap(self):
         """Тест: частичное пересечение."""
@@ -128,14 +1023,14 @@ class TestAppearanceFunction(unittest.TestCase):
                      'pupil': [10, 50],  # 40 секунд
                      'tutor': [30, 70]}  # 40 секунд
         # Пересечение: [30, 50] -> 20 секунд
-        self.assertEqual(appearance(intervals), 20)
+        self.assertEqual(self.appearance(intervals), 20)
 
     def test_intervals_outside_lesson(self):
         """Тест: интервалы ученика и учителя полностью вне урока."""
         intervals = {'lesson': [100, 200], # Урок длится 100 секунд
                      'pupil': [0, 50, 250, 300], # Полностью вне урока
                      'tutor': [10, 60, 260, 310]} # Полностью вне урока
-        self.assertEqual(appearance(intervals), 0)
+        self.assertEqual(self.appearance(intervals), 0)
 
     def test_intervals_clipping_by_lesson(self):
         """Тест: интервалы обрезаются границами урока."""
@@ -145,41 +1040,41 @@ class TestAppearanceFunction(unittest.TestCase):
         # Ученик (валидный): [100, 150]
         # Учитель (валидный): [120, 200]
         # Пересечение: [120, 150] -> 30 секунд
-        self.assertEqual(appearance(intervals), 30)
+        self.assertEqual(self.appearance(intervals), 30)
 
     def test_empty_pupil_intervals(self):
         """Тест: пустой список интервалов у ученика."""
         intervals = {'lesson': [0, 1000],
                      'pupil': [],
                      'tutor': [100, 200]}
-        self.assertEqual(appearance(intervals), 0)
+        self.assertEqual(self.appearance(intervals), 0)
 
     def test_empty_tutor_intervals(self):
         """Тест: пустой список интервалов у учителя."""
         intervals = {'lesson': [0, 1000],
                      'pupil': [100, 200],
                      'tutor': []}
-        self.assertEqual(appearance(intervals), 0)
+        self.assertEqual(self.appearance(intervals), 0)
 
     def test_empty_or_invalid_lesson_interval(self):
         """Тест: пустой или некорректный интервал урока."""
         intervals1 = {'lesson': [100, 100], # Нулевая длительность
                      'pupil': [0, 200],
                      'tutor': [0, 200]}
-        self.assertEqual(appearance(intervals1), 0)
+        self.assertEqual(self.appearance(intervals1), 0)
 
         intervals2 = {'lesson': [], # Пустой список урока
                      'pupil': [0, 200],
                      'tutor': [0, 200]}
-        self.assertEqual(appearance(intervals2), 0)
+        self.assertEqual(self.appearance(intervals2), 0)
 
         intervals3 = {'lesson': [200, 100], # Некорректный интервал (конец раньше начала)
                      'pupil': [0, 200],
                      'tutor': [0, 200]}
-        self.assertEqual(appearance(intervals3), 0)
+        self.assertEqual(self.appearance(intervals3), 0)
 
         intervals4 = {'pupil': [0, 200], 'tutor': [0, 200]} # Ключ 'lesson' отсутствует
-        self.assertEqual(appearance(intervals4), 0)
+        self.assertEqual(self.appearance(intervals4), 0)
 
 
     def test_pupil_multiple_segments_tutor_one_segment(self):
@@ -200,7 +1095,7 @@ class TestAppearanceFunction(unittest.TestCase):
         # Пересечение P2 и Т: [50,60] (10с)
         # Пересечение P3 и Т: [90,100] (10с)
         # Итого: 30с
-        self.assertEqual(appearance(intervals), 30)
+        self.assertEqual(self.appearance(intervals), 30)
 
     def test_tutor_multiple_segments_pupil_one_segment(self):
         """Тест: несколько сегментов у учителя, один у ученика."""
@@ -208,7 +1103,7 @@ class TestAppearanceFunction(unittest.TestCase):
                      'pupil': [0, 100],
                      'tutor': [10, 20, 50, 60, 90, 110]}
         # Аналогично предыдущему, результат 30с
-        self.assertEqual(appearance(intervals), 30)
+        self.assertEqual(self.appearance(intervals), 30)
 
     def test_both_multiple_segments_complex_overlap(self):
         """Тест: несколько сегментов у обоих, сложное пересечение."""
@@ -225,7 +1120,7 @@ class TestAppearanceFunction(unittest.TestCase):
         # У:[150,180] и Т:[30,80] -> Нет
         # У:[150,180] и Т:[100,160] -> [150,160] (10с)
         # Итого: 20 + 10 + 20 + 10 = 60с
-        self.assertEqual(appearance(intervals), 60)
+        self.assertEqual(self.appearance(intervals), 60)
 
     def test_adjacent_intervals_needing_merge(self):
         """Тест: смежные интервалы, требующие объединения."""
@@ -235,19 +1130,19 @@ class TestAppearanceFunction(unittest.TestCase):
         # Ученик (валидный, объединенный): [[10, 30]]
         # Учитель (валидный, объединенный): [[15, 25]]
         # Пересечение: [15, 25] -> 10с
-        self.assertEqual(appearance(intervals), 10)
+        self.assertEqual(self.appearance(intervals), 10)
 
     def test_one_party_absent_completely(self):
         """Тест: одна из сторон полностью отсутствует (пустой список интервалов)."""
         intervals = {'lesson': [0, 100],
                      'pupil': [10, 20],
                      'tutor': []} # Учитель отсутствует
-        self.assertEqual(appearance(intervals), 0)
+        self.assertEqual(self.appearance(intervals), 0)
 
         intervals2 = {'lesson': [0, 100],
                       'pupil': [], # Ученик отсутствует
                       'tutor': [10,20]}
-        self.assertEqual(appearance(intervals2), 0)
+        self.assertEqual(self.appearance(intervals2), 0)
 
     def test_intervals_touching_no_overlap(self):
         """Тест: интервалы касаются, но не перекрываются."""
@@ -255,7 +1150,7 @@ class TestAppearanceFunction(unittest.TestCase):
                      'pupil': [10, 30],
                      'tutor': [30, 50]}
         # У:[10,30] Т:[30,50] -> пересечение [30,30], длительность 0 (т.к. find_intersection вернет None при start >= end)
-        self.assertEqual(appearance(intervals), 0)
+        self.assertEqual(self.appearance(intervals), 0)
 
     def test_intervals_touching_with_overlap(self):
         """Тест: интервалы касаются и один из них содержит точку касания."""
@@ -263,7 +1158,7 @@ class TestAppearanceFunction(unittest.TestCase):
                      'pupil': [10, 40], # У:[10,40]
                      'tutor': [20, 50]} # Т:[20,50]
         # Пересечение: [20,40] -> 20с
-        self.assertEqual(appearance(intervals2), 20)
+        self.assertEqual(self.appearance(intervals2), 20)
 
     def test_invalid_segments_in_input(self):
         """Тест: некорректные сегменты во входных данных (начало >= конец)."""
@@ -290,7 +1185,565 @@ class TestAppearanceFunction(unittest.TestCase):
         # P2 и T1: [1594663396, 1594663430] (34с)
         # P2 и T2: [1594663443, 1594666472] (3029с)
         # Итого: 49 + 34 + 3029 = 3112
-        self.assertEqual(appearance(intervals), 3112)
+        self.assertEqual(self.appearance(intervals), 3112)
+
+
+@unittest.skipIf(np is None, 'numpy не установлен')
+class TestAppearanceNumpyBackend(TestAppearanceFunction):
+    """Все тесты TestAppearanceFunction для реализации на NumPy."""
+
+    backend = 'numpy'
+
+    def test_backends_agree_on_random_lessons(self):
+        """Тест: реализации на Python и NumPy совпадают на случайных уроках."""
+        generator = random.Random(3)
+        for case in range(100):
+            with self.subTest(f"Случайный урок {case}"):
+                lesson = random_lesson(generator)
+                self.assertEqual(self.appearance(lesson), appearance(lesson, backend='python'))
+
+    def test_unknown_backend(self):
+        """Тест: неизвестная реализация отклоняется."""
+        with self.assertRaises(ValueError):
+            appearance({'lesson': [0, 1], 'pupil': [], 'tutor': []}, backend='cuda')
+
+
+class TestIntervalSet(unittest.TestCase):
+
+    def test_clip_merge_intersect_total(self):
+        """Тест: обрезка, объединение, пересечение и суммарная длина."""
+        pupil = IntervalSet([0, 50, 70, 120, 150, 180, 40, 60, 300, 400]).clip(0, 200).merge()
+        self.assertEqual(pupil.to_list(), [[0, 60], [70, 120], [150, 180]])
+        tutor = IntervalSet([30, 80, 100, 160]).merge()
+        self.assertEqual(pupil.intersect(tutor).to_list(), [[30, 60], [70, 80], [100, 120], [150, 160]])
+        self.assertEqual(pupil.total(), 70)
+
+    def test_clip_drops_segments_outside_and_inverted(self):
+        """Тест: сегменты вне урока и с концом раньше начала удаляются, касающиеся урока остаются нулевыми."""
+        intervals = IntervalSet([0, 50, 100, 100, 150, 120, 250, 300, 190, 260]).clip(100, 200)
+        self.assertEqual(intervals.to_list(), [[100, 100], [190, 200]])
+
+    def test_matches_list_implementation(self):
+        """Тест: результат совпадает с find_intersection, merge_intervals и intersect_intervals."""
+        generator = random.Random(4)
+        lesson = [200, 800]
+        for case in range(50):
+            with self.subTest(f"Случайный набор {case}"):
+                pupil = random_intervals(generator, generator.randint(1, 30))
+                tutor = random_intervals(generator, generator.randint(1, 30))
+                clipped_pupil = [i for i in (find_intersection(lesson, p) for p in pupil) if i is not None]
+                clipped_tutor = [i for i in (find_intersection(lesson, t) for t in tutor) if i is not None]
+                expected_pupil = merge_intervals(clipped_pupil) if clipped_pupil else []
+                expected_tutor = merge_intervals(clipped_tutor) if clipped_tutor else []
+
+                pupil_set = IntervalSet([t for p in pupil for t in p]).clip(*lesson).merge()
+                tutor_set = IntervalSet([t for p in tutor for t in p]).clip(*lesson).merge()
+                self.assertEqual(pupil_set.to_list(), expected_pupil)
+                self.assertEqual(tutor_set.to_list(), expected_tutor)
+                self.assertEqual(pupil_set.intersect(tutor_set).to_list(), intersect_intervals(expected_pupil, expected_tutor))
+                self.assertEqual(merge_clipped_pairs([t for p in pupil for t in p], *lesson),
+                                 [tuple(interval) for interval in expected_pupil])
+
+    def test_small_and_large_lesson_paths_agree(self):
+        """Тест: уроки выше SMALL_LESSON_THRESHOLD считаются через IntervalSet с тем же результатом."""
+        generator = random.Random(5)
+        for case in range(5):
+            with self.subTest(f"Случайный урок {case}"):
+                pupil = [t for p in random_intervals(generator, SMALL_LESSON_THRESHOLD) for t in p]
+                tutor = [t for p in random_intervals(generator, SMALL_LESSON_THRESHOLD) for t in p]
+                expected = sum(end - start for start, end in intersect_intervals(
+                    merge_clipped_pairs(pupil, 200, 800), merge_clipped_pairs(tutor, 200, 800)))
+                self.assertEqual(appearance({'lesson': [200, 800], 'pupil': pupil, 'tutor': tutor}, backend='python'), expected)
+
+    def test_input_arrays_are_not_modified(self):
+        """Тест: переданные array('q') копируются и не изменяются ни набором, ни функциями урока."""
+        lesson = [100, 200]
+        pupil = array('q', [50, 150, 10, 20, 120, 180])
+        tutor = array('q', [0, 300, 250, 260])
+        intervals = {'lesson': lesson, 'pupil': pupil, 'tutor': tutor}
+
+        self.assertEqual(IntervalSet(pupil).clip(*lesson).merge().to_list(), [[100, 180]])
+        self.assertEqual(appearance(intervals, backend='python'), 80)
+        self.assertEqual(appearance(intervals, backend='python', cache=MergedIntervalsCache()), 80)
+        self.assertEqual(GroupAppearance(lesson, {'pupil': pupil, 'tutor': tutor}).overlap('pupil'), 80)
+        self.assertEqual(PresenceIndex([('lesson', intervals)]).overlap_seconds(0, 300), {'lesson': 80})
+        self.assertEqual(pupil, array('q', [50, 150, 10, 20, 120, 180]))
+        self.assertEqual(tutor, array('q', [0, 300, 250, 260]))
+
+    def test_compact_storage(self):
+        """Тест: у набора нет __dict__, данные лежат в одном array('q')."""
+        intervals = IntervalSet([1, 2, 3, 4])
+        self.assertFalse(hasattr(intervals, '__dict__'))
+        self.assertEqual(intervals.bounds.typecode, 'q')
+        self.assertEqual(len(intervals), 2)
+        with self.assertRaises(ValueError):
+            IntervalSet([1, 2, 3])
+
+
+class TestAppearanceTracker(unittest.TestCase):
+
+    def test_tracker_matches_appearance_on_provided_examples(self):
+        """Тест: на примерах из условия трекер даёт тот же результат, что и appearance."""
+        for case, test in enumerate(TestAppearanceFunction.provided_tests):
+            with self.subTest(f"Предоставленный тестовый случай {case}"):
+                tracker = replay_lesson(test['intervals'], window=0, generator=None)
+                self.assertEqual(tracker.total(), test['answer'])
+
+    def test_tracker_out_of_order_within_window(self):
+        """Тест: события, перемешанные в пределах окна, дают тот же результат, что и appearance."""
+        generator = random.Random(5)
+        for case in range(100):
+            with self.subTest(f"Случайный урок {case}"):
+                lesson = random_lesson(generator)
+                tracker = replay_lesson(lesson, window=50, generator=generator)
+                self.assertEqual(tracker.total(), appearance(lesson))
+
+    def test_intervals_with_inverted_segments(self):
+        """Тест: подключения целиком, перемешанные в пределах окна; сегменты с концом раньше начала отбрасываются."""
+        tracker = AppearanceTracker([0, 100], window=10)
+        for role, timestamps in (('pupil', [10, 60, 40, 30]), ('tutor', [0, 100])):
+            for j in range(0, len(timestamps), 2):
+                tracker.add_interval(role, timestamps[j], timestamps[j + 1])
+        self.assertEqual(tracker.total(), 50)
+        self.assertEqual(appearance({'lesson': [0, 100], 'pupil': [10, 60, 40, 30], 'tutor': [0, 100]}), 50)
+
+        generator = random.Random(6)
+        for case in range(100):
+            with self.subTest(f"Случайный урок {case}"):
+                lesson = random_lesson(generator)
+                for role in AppearanceTracker.ROLES:
+                    for _ in range(generator.randint(0, 3)):
+                        start = generator.randint(0, 1000)
+                        lesson[role] += [start, start - generator.randint(1, 100)]
+                tracker = replay_lesson_intervals(lesson, window=50, generator=generator)
+                self.assertEqual(tracker.total(), appearance(lesson))
+
+    def test_running_total(self):
+        """Тест: промежуточный результат во время урока, в том числе до момента until."""
+        tracker = AppearanceTracker([0, 100], window=0)
+        tracker.join('tutor', 5)
+        tracker.join('pupil', 10)
+        self.assertEqual(tracker.total(), 0)
+        self.assertEqual(tracker.total(until=30), 20)
+        tracker.leave('pupil', 40)
+        self.assertEqual(tracker.total(until=60), 30)
+        tracker.join('pupil', 90)
+        self.assertEqual(tracker.total(until=150), 40)  # обрезается концом урока
+
+    def test_late_event_and_unknown_role(self):
+        """Тест: событие позже окна и неизвестная роль отклоняются."""
+        tracker = AppearanceTracker([0, 100], window=10)
+        tracker.join('pupil', 50)
+        tracker.join('tutor', 70)
+        with self.assertRaises(ValueError):
+            tracker.leave('pupil', 40)
+        with self.assertRaises(ValueError):
+            tracker.join('guest', 80)
+
+
+# События входа и выхода урока в порядке времени; если передан generator, то события
+# перемешиваются так, чтобы каждое опаздывало не больше чем на window секунд
+def lesson_events(intervals: dict[str, list[int]], window: int, generator: random.Random | None) -> list[tuple[int, str, str]]:
+
+    events = []
+    for role in AppearanceTracker.ROLES:
+        timestamps = intervals[role]
+        for j in range(0, len(timestamps), 2):
+            events.append((timestamps[j], role, 'join'))
+            events.append((timestamps[j + 1], role, 'leave'))
+
+    if generator is None:
+        return sorted(events)
+
+    return sorted(events, key=lambda event: event[0] + generator.uniform(0, window))
+
+
+# Воспроизведение урока через AppearanceTracker
+def replay_lesson(intervals: dict[str, list[int]], window: int, generator: random.Random | None) -> AppearanceTracker:
+
+    tracker = AppearanceTracker(intervals['lesson'], window=window)
+    for timestamp, role, action in lesson_events(intervals, window, generator):
+        getattr(tracker, action)(role, timestamp)
+    return tracker
+
+
+# Воспроизведение урока через AppearanceTracker.add_interval: подключения в порядке входа,
+# каждое опаздывает не больше чем на window секунд
+def replay_lesson_intervals(intervals: dict[str, list[int]], window: int, generator: random.Random) -> AppearanceTracker:
+
+    connections = [
+        (intervals[role][j], intervals[role][j + 1], role)
+        for role in AppearanceTracker.ROLES for j in range(0, len(intervals[role]), 2)
+    ]
+
+    tracker = AppearanceTracker(intervals['lesson'], window=window)
+    for start, end, role in sorted(connections, key=lambda connection: connection[0] + generator.uniform(0, window)):
+        tracker.add_interval(role, start, end)
+    return tracker
+
+
+class TestGroupAppearance(unittest.TestCase):
+
+    def test_pairs_match_appearance(self):
+        """Тест: совместное присутствие каждого ученика с учителем совпадает с appearance."""
+        generator = random.Random(6)
+        for case in range(30):
+            with self.subTest(f"Случайный групповой урок {case}"):
+                lesson = [200, 800]
+                participants = {name: random_lesson(generator)['pupil'] for name in ('tutor', 'аня', 'боря', 'вера')}
+                group = GroupAppearance(lesson, participants)
+                for name in ('аня', 'боря', 'вера'):
+                    expected = appearance({'lesson': lesson, 'pupil': participants[name], 'tutor': participants['tutor']})
+                    self.assertEqual(group.overlap(name), expected)
+                self.assertEqual(set(group.overlaps()), {'аня', 'боря', 'вера'})
+
+    def test_k_of_n_matches_per_second_count(self):
+        """Тест: время присутствия не меньше k участников совпадает с посекундным подсчётом."""
+        generator = random.Random(7)
+        for case in range(30):
+            with self.subTest(f"Случайный групповой урок {case}"):
+                lesson = [100, 900]
+                participants = {f'участник {k}': random_lesson(generator)['pupil'] for k in range(5)}
+                participants['tutor'] = random_lesson(generator)['tutor']
+                group = GroupAppearance(lesson, participants)
+
+                # Посекундно: секунда [t, t + 1) занята, если она целиком внутри интервала участника
+                counts = [0] * (lesson[1] - lesson[0])
+                for timestamps in participants.values():
+                    seconds = set()
+                    for j in range(0, len(timestamps), 2):
+                        seconds.update(range(max(timestamps[j], lesson[0]), min(timestamps[j + 1], lesson[1])))
+                    for second in seconds:
+                        counts[second - lesson[0]] += 1
+
+                for k in range(1, len(participants) + 1):
+                    self.assertEqual(group.at_least(k), sum(1 for count in counts if count >= k))
+                self.assertEqual(group.everyone(), group.at_least(len(participants)))
+                self.assertEqual(sum(group.coverage), lesson[1] - lesson[0])
+
+    def test_two_participants_everyone_is_appearance(self):
+        """Тест: для ученика и учителя время присутствия всех равно appearance."""
+        for i, test_case in enumerate(TestAppearanceFunction.provided_tests):
+            with self.subTest(f"Предоставленный тестовый случай {i}"):
+                intervals = test_case['intervals']
+                group = GroupAppearance(intervals['lesson'], {'pupil': intervals['pupil'], 'tutor': intervals['tutor']})
+                self.assertEqual(group.everyone(), test_case['answer'])
+                self.assertEqual(group.overlap('pupil'), test_case['answer'])
+
+    def test_invalid_arguments(self):
+        """Тест: отсутствующий ведущий участник и неположительное k отклоняются."""
+        with self.assertRaises(ValueError):
+            GroupAppearance([0, 100], {'pupil': [0, 10]})
+        with self.assertRaises(ValueError):
+            GroupAppearance([0, 100], {'tutor': [0, 10]}).at_least(0)
+
+
+class TestAppearanceLog(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        generator = random.Random(8)
+        self.lessons = {f'урок-{k}': random_lesson(generator) for k in range(20)}
+        self.lessons.update({f'пример-{k}': test['intervals'] for k, test in enumerate(TestAppearanceFunction.provided_tests)})
+        self.expected = {lesson_id: appearance(intervals) for lesson_id, intervals in self.lessons.items()}
+
+    # Строки журнала (lesson_id, role, start, end) для всех уроков
+    def log_rows(self) -> list[tuple[str, str, int, int]]:
+        rows = []
+        for lesson_id, intervals in self.lessons.items():
+            for role in ('lesson', 'pupil', 'tutor'):
+                timestamps = intervals[role]
+                rows.extend((lesson_id, role, timestamps[j], timestamps[j + 1]) for j in range(0, len(timestamps), 2))
+        return rows
+
+    def write_csv(self, rows) -> str:
+        path = os.path.join(self.directory, 'log.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['lesson_id', 'role', 'start', 'end'])
+            writer.writerows(rows)
+        return path
+
+    def read_results(self, path) -> dict[str, int]:
+        with open(path, encoding='utf-8', newline='') as file:
+            return {lesson_id: int(seconds) for lesson_id, seconds in list(csv.reader(file))[1:]}
+
+    def test_csv_log(self):
+        """Тест: результаты по CSV-журналу совпадают с appearance, в том числе через mmap."""
+        path = self.write_csv(self.log_rows())
+        for use_mmap in (False, True):
+            with self.subTest(f"mmap: {use_mmap}"):
+                output = os.path.join(self.directory, 'result.csv')
+                self.assertEqual(appearance_log(path, output, use_mmap=use_mmap, chunk_size=64), len(self.lessons))
+                self.assertEqual(self.read_results(output), self.expected)
+
+    def test_jsonl_log(self):
+        """Тест: результаты по JSONL-журналу совпадают с appearance."""
+        path = os.path.join(self.directory, 'log.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            for lesson_id, role, start, end in self.log_rows():
+                file.write(json.dumps({'lesson_id': lesson_id, 'role': role, 'start': start, 'end': end}) + '\n')
+        output = os.path.join(self.directory, 'result.csv')
+        appearance_log(path, output, use_mmap=True)
+        self.assertEqual(self.read_results(output), self.expected)
+
+    def test_unsorted_log(self):
+        """Тест: перемешанный журнал обрабатывается через раскладку по временным файлам."""
+        rows = self.log_rows()
+        random.Random(9).shuffle(rows)
+        path = self.write_csv(rows)
+        output = os.path.join(self.directory, 'result.csv')
+        self.assertEqual(appearance_log(path, output, grouped=False), len(self.lessons))
+        self.assertEqual(self.read_results(output), self.expected)
+
+    def test_quoted_csv_fields(self):
+        """Тест: поля CSV в кавычках, в том числе с запятой и переводом строки, и заголовок с другими названиями."""
+        path = os.path.join(self.directory, 'log.csv')
+        with open(path, 'wb') as file:
+            file.write(b'id,role,start,end\n'
+                       b'"7",lesson,0,100\n'
+                       b'"7","pupil","10","60"\n'
+                       b'7,tutor,0,100\n'
+                       b'"a, b",lesson,0,100\n'
+                       b'"a, b",pupil,0,30\n'
+                       b'"a, ""b""\nc",tutor,20,50\n')
+        for use_mmap in (False, True):
+            with self.subTest(f"mmap: {use_mmap}"):
+                self.assertEqual(list(read_attendance_rows(path, use_mmap=use_mmap)), [
+                    ('7', 'lesson', 0, 100), ('7', 'pupil', 10, 60), ('7', 'tutor', 0, 100),
+                    ('a, b', 'lesson', 0, 100), ('a, b', 'pupil', 0, 30), ('a, "b"\nc', 'tutor', 20, 50),
+                ])
+
+        # Без заголовка первая строка - данные; некорректное число в следующих строках - ошибка
+        self.assertEqual(list(parse_attendance_lines([b'1,lesson,0,10\n'], is_jsonl=False)), [('1', 'lesson', 0, 10)])
+        with self.assertRaises(ValueError):
+            list(parse_attendance_lines([b'1,lesson,0,10\n', b'1,pupil,x,10\n'], is_jsonl=False))
+
+        # Урок "7" из CSV совпадает с уроком 7 из JSONL
+        jsonl_path = os.path.join(self.directory, 'log.jsonl')
+        with open(jsonl_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'lesson_id': 7, 'role': 'pupil', 'start': 10, 'end': 60}) + '\n')
+        self.assertEqual(next(read_attendance_rows(jsonl_path))[0], next(read_attendance_rows(path))[0])
+
+    def test_unsorted_log_with_quoted_ids(self):
+        """Тест: идентификаторы с запятыми и кавычками проходят через временные файлы partition_lessons."""
+        self.lessons = {f'урок, "{lesson_id}"': intervals for lesson_id, intervals in self.lessons.items()}
+        self.expected = {f'урок, "{lesson_id}"': seconds for lesson_id, seconds in self.expected.items()}
+        self.test_unsorted_log()
+
+    def test_ungrouped_rows_rejected(self):
+        """Тест: урок, строки которого встречаются снова после другого урока, отклоняется."""
+        lesson, pupil, tutor = ('lesson', 0, 100), ('pupil', 10, 20), ('tutor', 0, 50)
+        rows = [('1', *lesson), ('1', *pupil), ('2', *lesson), ('1', *tutor)]
+        lessons = group_lessons(rows)
+        self.assertEqual(next(lessons)[0], '1')
+        with self.assertRaises(ValueError):
+            next(lessons)
+        # Раскладка по временным файлам собирает такой журнал целиком
+        self.assertEqual(dict(partition_lessons(rows)), {
+            '1': {'lesson': [0, 100], 'pupil': [10, 20], 'tutor': [0, 50]},
+            '2': {'lesson': [0, 100], 'pupil': [], 'tutor': []},
+        })
+
+    def test_unknown_role(self):
+        """Тест: строка с неизвестной ролью отклоняется."""
+        with self.assertRaises(ValueError):
+            list(group_lessons([('1', 'guest', 0, 10)]))
+
+
+class TestMergedIntervalsCache(unittest.TestCase):
+
+    def test_clipped_matches_clip_then_merge(self):
+        """Тест: обрезка закэшированных интервалов совпадает с обрезкой и объединением заново."""
+        generator = random.Random(10)
+        cache = MergedIntervalsCache()
+        for case in range(50):
+            timestamps = [t for interval in random_intervals(generator, generator.randint(0, 30)) for t in interval]
+            timestamps.extend([500, 450])  # сегмент с концом раньше начала
+            for window in range(5):
+                start = generator.randint(0, 900)
+                end = start + generator.randint(0, 300)
+                with self.subTest(f"Случайный набор {case}, окно [{start}, {end}]"):
+                    expected = IntervalSet(timestamps).clip(start, end).merge()
+                    self.assertEqual(cache.clipped(timestamps, start, end).to_list(), expected.to_list())
+        self.assertEqual((cache.misses, cache.hits), (50, 200))
+
+    def test_inverted_window_is_empty(self):
+        """Тест: окно с концом раньше начала даёт пустой набор, как и clip() с merge()."""
+        cache = MergedIntervalsCache()
+        self.assertEqual(cache.clipped([0, 1000], 200, 100).to_list(), [])
+        self.assertEqual(IntervalSet([0, 1000]).clip(200, 100).merge().to_list(), [])
+        self.assertEqual(cache.clipped([0, 1000], 200, 200).to_list(), [[200, 200]])
+
+    def test_appearance_with_cache(self):
+        """Тест: appearance с кэшем совпадает с appearance без него при сдвиге границ урока."""
+        cache = MergedIntervalsCache()
+        for test_case in TestAppearanceFunction.provided_tests:
+            intervals = test_case['intervals']
+            self.assertEqual(appearance(intervals, cache=cache), test_case['answer'])
+            for shift in (-600, -60, 60, 600):
+                shifted = dict(intervals, lesson=[intervals['lesson'][0] + shift, intervals['lesson'][1] + shift])
+                self.assertEqual(appearance(shifted, cache=cache), appearance(shifted))
+
+    def test_lru_eviction_and_disk(self):
+        """Тест: вытеснение давно не использованной записи и чтение с диска после вытеснения."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MergedIntervalsCache(maxsize=1, directory=directory)
+            first, second = [0, 10, 5, 20], [100, 110]
+            self.assertEqual(cache.merged(first).to_list(), [[0, 20]])
+            cache.merged(second)                              # вытесняет first из памяти
+            self.assertEqual(len(cache.entries), 1)
+            self.assertEqual(cache.merged(first).to_list(), [[0, 20]])
+            self.assertEqual((cache.misses, cache.disk_hits, cache.hits), (2, 1, 0))
+
+            # Новый экземпляр читает записи, сохранённые предыдущим
+            restored = MergedIntervalsCache(directory=directory)
+            self.assertEqual(restored.merged(second).to_list(), [[100, 110]])
+            self.assertEqual(restored.disk_hits, 1)
+            self.assertEqual(os.path.getsize(restored.path(restored.key(second))), 16)
+
+
+class TestPresenceIndex(unittest.TestCase):
+
+    def setUp(self):
+        generator = random.Random(11)
+        self.lessons = {f'урок-{k}': random_lesson(generator) for k in range(200)}
+        for lesson in self.lessons.values():
+            shift = generator.randint(0, 5000)
+            for role in ('lesson', 'pupil', 'tutor'):
+                lesson[role] = [timestamp + shift for timestamp in lesson[role]]
+        self.index = PresenceIndex(self.lessons.items())
+
+    # Секунды совместного присутствия в окне [start, end) перебором всех уроков через appearance
+    def brute_force(self, start: int, end: int) -> dict[str, int]:
+        seconds = {}
+        for lesson_id, lesson in self.lessons.items():
+            lesson_start, lesson_end = lesson['lesson']
+            window = [max(start, lesson_start), min(end, lesson_end)]
+            if window[0] < window[1]:
+                common = appearance(dict(lesson, lesson=window))
+                if common:
+                    seconds[lesson_id] = common
+        return seconds
+
+    def test_window_queries_match_brute_force(self):
+        """Тест: запросы по окну совпадают с перебором всех уроков."""
+        generator = random.Random(12)
+        for case in range(100):
+            start = generator.randint(-100, 6500)
+            end = start + generator.randint(1, 500)
+            with self.subTest(f"Окно [{start}, {end})"):
+                expected = self.brute_force(start, end)
+                self.assertEqual(self.index.overlap_seconds(start, end), expected)
+                self.assertEqual(self.index.present_during(start, end), set(expected))
+
+    def test_point_queries_match_brute_force(self):
+        """Тест: запросы по моменту времени совпадают с перебором всех уроков."""
+        generator = random.Random(13)
+        for case in range(100):
+            timestamp = generator.randint(-100, 6500)
+            with self.subTest(f"Момент {timestamp}"):
+                self.assertEqual(self.index.present_at(timestamp), set(self.brute_force(timestamp, timestamp + 1)))
+
+    def test_touching_and_empty(self):
+        """Тест: касание окна не считается присутствием, пустой индекс отвечает пустыми результатами."""
+        index = PresenceIndex([('1', {'lesson': [0, 100], 'pupil': [10, 50], 'tutor': [0, 100]})])
+        self.assertEqual(index.present_during(50, 60), set())
+        self.assertEqual(index.present_during(0, 10), set())
+        self.assertEqual(index.present_at(10), {'1'})
+        self.assertEqual(index.present_at(50), set())
+        self.assertEqual(PresenceIndex([]).present_at(10), set())
+
+
+class TestIntersectionEngine(unittest.TestCase):
+
+    def test_intersect_intervals_matches_pairwise_loop(self):
+        """Тест: проход двумя указателями совпадает с попарным перебором интервалов."""
+        generator = random.Random(0)
+        for case in range(50):
+            with self.subTest(f"Случайный набор {case}"):
+                pupil = merge_intervals(random_intervals(generator, generator.randint(1, 30)))
+                tutor = merge_intervals(random_intervals(generator, generator.randint(1, 30)))
+                expected = sum(count_intersection_seconds(p, t) for p in pupil for t in tutor)
+                intersections = intersect_intervals(pupil, tutor)
+                self.assertEqual(sum(end - start for start, end in intersections), expected)
+                self.assertEqual(intersections, sorted(intersections))
+
+    def test_intersect_many_three_participants(self):
+        """Тест: пересечение трёх участников, включая перекрывающиеся интервалы одного участника."""
+        first = [[0, 50], [40, 100]]          # объединяется в [0, 100]
+        second = [[10, 30], [60, 90]]
+        third = [[20, 70]]
+        self.assertEqual(intersect_many(first, second, third), [[20, 30], [60, 70]])
+
+    def test_intersect_many_touching_and_empty(self):
+        """Тест: касание интервалов не даёт пересечения, пустой участник - пустой результат."""
+        self.assertEqual(intersect_many([[0, 10]], [[10, 20]]), [])
+        self.assertEqual(intersect_many([[0, 10]], []), [])
+        self.assertEqual(intersect_many(), [])
+
+    def test_intersect_many_matches_two_pointer(self):
+        """Тест: для двух участников intersect_many совпадает с intersect_intervals."""
+        generator = random.Random(1)
+        for case in range(50):
+            with self.subTest(f"Случайный набор {case}"):
+                pupil = random_intervals(generator, generator.randint(1, 30))
+                tutor = random_intervals(generator, generator.randint(1, 30))
+                self.assertEqual(
+                    intersect_many(pupil, tutor),
+                    intersect_intervals(merge_intervals([list(i) for i in pupil]), merge_intervals([list(i) for i in tutor])),
+                )
+
+
+class TestAppearanceBatch(unittest.TestCase):
+
+    def test_batch_matches_sequential(self):
+        """Тест: пакетный подсчёт в одном и нескольких процессах совпадает с appearance."""
+        generator = random.Random(2)
+        lessons = [random_lesson(generator) for _ in range(25)]
+        expected = [appearance(lesson) for lesson in lessons]
+        for workers in (1, 2):
+            with self.subTest(f"Процессов: {workers}"):
+                results = appearance_batch((lesson for lesson in lessons), workers=workers, chunksize=4)
+                self.assertEqual(list(results), expected)
+
+    def test_batch_is_lazy(self):
+        """Тест: уроки читаются из потока по мере необходимости, а не целиком."""
+        consumed = []
+
+        def lessons():
+            for k in range(1_000_000):
+                consumed.append(k)
+                yield {'lesson': [0, 100], 'pupil': [0, k % 100], 'tutor': [0, 100]}
+
+        results = appearance_batch(lessons(), workers=2, chunksize=10)
+        self.assertEqual([next(results) for _ in range(15)], list(range(15)))
+        results.close()
+        self.assertLessEqual(len(consumed), 10 * 2 * 2 + 10)
+
+    def test_batch_invalid_chunksize(self):
+        """Тест: неположительный размер пачки отклоняется."""
+        with self.assertRaises(ValueError):
+            list(appearance_batch([], chunksize=0))
+
+
+# Случайный урок для тестов: урок [0, 1000] и интервалы ученика и учителя
+def random_lesson(generator: random.Random) -> dict[str, list[int]]:
+    return {'lesson': [0, 1000],
+            'pupil': [timestamp for interval in random_intervals(generator, generator.randint(0, 10)) for timestamp in interval],
+            'tutor': [timestamp for interval in random_intervals(generator, generator.randint(0, 10)) for timestamp in interval]}
+
+
+# Случайные интервалы для тестов: [начало, конец] с началом не позже конца
+def random_intervals(generator: random.Random, count: int) -> list[list[int]]:
+    intervals = []
+    for _ in range(count):
+        start = generator.randint(0, 1000)
+        intervals.append([start, start + generator.randint(0, 100)])
+    return intervals
 
 
 if __name__ == '__main__':